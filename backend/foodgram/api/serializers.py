@@ -1,16 +1,21 @@
-import base64
-
 from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from django.conf import settings
 from django.contrib.auth.hashers import make_password
-from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
 from rest_framework import serializers
 
 from app.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                         ShoppingCart, Tag, TagRecipe)
+from core.cache import invalidate_recipes
+from core.images import (ImageLimitError, check_uploaded_image,
+                         decode_base64_image, get_size_name)
+from core.registry import tag_registry
 from core.validators import (validate_favorite_shopping_cart,
                              validate_subscribe, validate_tags_ingredients,
-                             validate_amount, validate_cooking_time, )
+                             validate_amount, validate_cooking_time,
+                             validate_unknown_ids, )
 from users.models import Subscribe, User
 
 
@@ -25,6 +30,9 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         """Возвращает bool значение подписки текущего пользователя."""
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         return Subscribe.objects.filter(
             author=obj.pk, user=self.context.get('request').user.pk).exists()
 
@@ -58,12 +66,15 @@ class UserSubscribeSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         """Возвращает bool значение подписки текущего пользователя."""
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         user_pk = self.context.get('request').user.pk
         return Subscribe.objects.filter(author=obj.pk, user=user_pk).exists()
 
     def get_recipes_count(self, obj):
         """Возвращает кол-во рецептов автора."""
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -72,11 +83,40 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
 
 
-class TagRecipeSerializer(serializers.ModelSerializer):
+class TagPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Проверяет id тега по реестру тегов без запроса в БД."""
+
+    def to_pk(self, data):
+        """Id тега числом: принимаются целые числа и строки из цифр
+           (multipart), остальные значения — ошибка типа."""
+        if isinstance(data, str) and data.strip().isdigit():
+            return int(data)
+        if isinstance(data, bool) or not isinstance(data, int):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        return data
+
+    def to_internal_value(self, data):
+        pk = self.to_pk(data)
+        tag = tag_registry.get(pk)
+        if tag is None:
+            self.fail('does_not_exist', pk_value=pk)
+        return tag
 
-    class Meta:
-        fields = ('recipe', 'tag', )
-        model = TagRecipe
+
+class TagManyRelatedField(serializers.ManyRelatedField):
+    """Проверяет список id тегов целиком и сообщает разом
+       обо всех неизвестных id."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        pks = [self.child_relation.to_pk(pk) for pk in data]
+        tags = [tag_registry.get(pk) for pk in pks]
+        validate_unknown_ids([pk for pk, tag in zip(pks, tags)
+                              if tag is None])
+        return tags
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -89,8 +129,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 class IngredientAmountSerializer(serializers.Serializer):
 
     amount = serializers.IntegerField()
-    id = serializers.ModelField(model_field=Ingredient(
-                                )._meta.get_field('id'))
+    id = serializers.IntegerField()
 
     def validate_amount(self, data):
         return validate_amount(data, settings.AMOUNT_MIN_VALUE,
@@ -98,46 +137,62 @@ class IngredientAmountSerializer(serializers.Serializer):
                                'Количество ингредиента')
 
 
-class IngredientRecipeSerializer(serializers.ModelSerializer):
+class IngredientRecipeReadOnlySerializer(serializers.ModelSerializer):
+    """Ингредиент рецепта вместе с его кол-вом."""
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit')
 
     class Meta:
-        fields = ('recipe', 'ingredient', 'amount', )
+        fields = ('id', 'name', 'measurement_unit', 'amount', )
         model = IngredientRecipe
 
 
 class Base64ImageField(serializers.ImageField):
-    """Преобразует base64-строку в изображение."""
+    """Преобразует base64-строку или загруженный файл в изображение.
+       Строка декодируется по частям во временный файл, размер и
+       число пикселей проверяются до декодирования изображения."""
+
+    default_error_messages = {
+        'max_bytes': (f'Размер изображения не должен превышать '
+                      f'{settings.IMAGE_MAX_BYTES // (1024 * 1024)} МБ.'),
+        'max_pixels': (f'Изображение не должно содержать больше '
+                       f'{settings.IMAGE_MAX_PIXELS} пикселей.'),
+    }
+
     def to_internal_value(self, data):
         try:
-            format, data = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(data), name='temp.' + ext)
+            if isinstance(data, UploadedFile):
+                data = check_uploaded_image(data)
+            else:
+                data = decode_base64_image(data)
+        except ImageLimitError as error:
+            self.fail(error.code)
         except (ValueError, AttributeError):
-            data = 'no correct'
-        return super().to_internal_value(data)
-
+            self.fail('invalid_image')
+        return serializers.FileField.to_internal_value(self, data)
 
-class RecipeReadOnlyFavoriteShoppingSubscribeSerializer(
-      serializers.ModelSerializer):
 
-    class Meta:
-        fields = ('id', 'name', 'image', 'cooking_time', )
-        model = Recipe
+class ImageSaveMixin:
+    """Удаляет временный файл фото после сохранения."""
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image:
+                image.close()
 
-class RecipePATCHSerializer(serializers.ModelSerializer):
-    """Serializer для валидации полей PATCH-запроса."""
 
-    tags = serializers.ListField(required=True)
-    ingredients = IngredientAmountSerializer(many=True, required=True)
+class RecipeReadOnlyFavoriteShoppingSubscribeSerializer(
+      serializers.ModelSerializer):
 
     class Meta:
-        fields = ('ingredients', 'tags', 'name', 'image',
-                  'text', 'cooking_time', )
+        fields = ('id', 'name', 'image', 'cooking_time', )
         model = Recipe
-        extra_kwargs = {
-            'image': {'required': False},
-        }
 
 
 class RecipeReadOnlySerializer(serializers.ModelSerializer):
@@ -146,33 +201,73 @@ class RecipeReadOnlySerializer(serializers.ModelSerializer):
     is_in_shopping_cart = (
         serializers.SerializerMethodField('get_is_in_shopping_cart')
         )
-    tags = TagSerializer(many=True)
-    ingredients = IngredientSerializer(many=True)
+    tags = serializers.SerializerMethodField('get_tags')
+    ingredients = IngredientRecipeReadOnlySerializer(
+        source='ingredients_recipe', many=True)
     author = UserSerializer()
+    image_sizes = serializers.SerializerMethodField('get_image_sizes')
 
     class Meta:
         fields = (
             'id', 'author', 'ingredients', 'tags', 'name', 'image',
-            'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart',
+            'image_sizes', 'text', 'cooking_time', 'is_favorited',
+            'is_in_shopping_cart',
             )
         model = Recipe
 
+    def get_image_sizes(self, obj):
+        """Возвращает ссылки на уменьшенные WebP-копии фото.
+           Пока копии не готовы, отдаётся ссылка на само фото."""
+        if not obj.image:
+            return None
+        ready = obj.thumbnails_for == obj.image.name
+        request = self.context.get('request')
+        sizes = {}
+        for size in settings.IMAGE_SIZES:
+            url = (obj.image.storage.url(get_size_name(obj.image.name, size))
+                   if ready else obj.image.url)
+            sizes[size] = (request.build_absolute_uri(url) if request
+                           else url)
+        return sizes
+
+    def get_tags(self, obj):
+        """Возвращает теги рецепта из реестра тегов."""
+        return TagSerializer(tag_registry.get_many(
+            [tag_recipe.tag_id for tag_recipe in obj.tags_recipe.all()]
+        ), many=True).data
+
     def get_is_favorited(self, obj):
         """Возвращает bool значение нахождения рецепта в избранном."""
+        is_favorited = getattr(obj, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
         user_pk = self.context.get('request').user.pk
         return Favorite.objects.filter(recipe=obj.pk, user=user_pk).exists()
 
     def get_is_in_shopping_cart(self, obj):
         """Возвращает bool значение нахождения рецепта в списке покупок."""
+        is_in_shopping_cart = getattr(obj, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
         user_pk = self.context.get('request').user.pk
         return ShoppingCart.objects.filter(recipe=obj.pk,
                                            user=user_pk).exists()
 
+    def to_representation(self, obj):
+        """Передаёт автору аннотированный признак подписки."""
+        author_is_subscribed = getattr(obj, 'author_is_subscribed', None)
+        if author_is_subscribed is not None:
+            obj.author.is_subscribed = author_is_subscribed
+        return super().to_representation(obj)
+
+
+class RecipeSerializer(ImageSaveMixin, serializers.ModelSerializer):
 
-class RecipeSerializer(serializers.ModelSerializer):
+    patch_required_fields = ('ingredients', 'tags', 'name', 'text',
+                             'cooking_time', )
 
-    tags = serializers.PrimaryKeyRelatedField(many=True,
-                                              queryset=Tag.objects.all())
+    tags = TagManyRelatedField(
+        child_relation=TagPrimaryKeyRelatedField(queryset=Tag.objects.all()))
     ingredients = IngredientAmountSerializer(many=True)
     image = Base64ImageField()
     cooking_time = serializers.IntegerField()
@@ -187,35 +282,46 @@ class RecipeSerializer(serializers.ModelSerializer):
             'author': {'read_only': True},
         }
 
-    def _delete_old_tags_or_ingredients(self, recipe, name_field):
-        """Удаляет старые записи M:M рецепты-(теги, ингредиенты)
-            при PATCH-запросе."""
-        metod = self.context.get('request').method
-        if metod == 'PATCH':
-            if name_field == 'ingredient':
-                recipe.ingredients_recipe.all().delete()
-            if name_field == 'tag':
-                recipe.tags_recipe.all().delete()
-
-    def _save_tags_or_ingredients(self, serializer, data,
-                                  name_field, recipe):
-        """Сохраняет(обновляет) данные тегов и ингредиентов."""
-        if name_field == 'ingredient':
-            for field in data:
-                new_ingredient = {'recipe': recipe.pk, name_field:
-                                  field.get('id')}
-                field.pop('id')
-                field.update(new_ingredient)
-        if name_field == 'tag':
-            data = [{'recipe': recipe.pk, name_field: field.pk}
-                    for field in data]
-
-        data = serializer(data=data, many=True)
-        data.is_valid(raise_exception=True)
-
-        self._delete_old_tags_or_ingredients(recipe, name_field)
-
-        data.save()
+    def _save_tags_or_ingredients(self, model, data, name_field, recipe):
+        """Сохраняет(обновляет) данные тегов и ингредиентов.
+           Старые записи сравниваются с новыми: новые добавляются одним
+           bulk_create, изменённые обновляются одним bulk_update,
+           лишние удаляются одним запросом: у моделей связей нет
+           сигналов, кеш рецепта сбрасывается один раз в конце."""
+        related_name = model._meta.get_field(
+            'recipe').remote_field.get_accessor_name()
+        new = {row[name_field].pk: row for row in data}
+        fields = [field for field in data[0] if field != name_field]
+        old = {} if self.instance is None else {
+            getattr(obj, f'{name_field}_id'): obj
+            for obj in getattr(recipe, related_name).all()}
+
+        updated = []
+        for key in old.keys() & new.keys():
+            obj = old[key]
+            setattr(obj, name_field, new[key][name_field])
+            if any(getattr(obj, field) != new[key][field]
+                   for field in fields):
+                for field in fields:
+                    setattr(obj, field, new[key][field])
+                updated.append(obj)
+        deleted = [obj.pk for key, obj in old.items() if key not in new]
+
+        if deleted:
+            model.objects.filter(pk__in=deleted).delete()
+        if updated:
+            model.objects.bulk_update(updated, fields)
+        created = model.objects.bulk_create(
+            [model(recipe=recipe, **row) for key, row in new.items()
+             if key not in old])
+        recipe.saved_relations[related_name] = [
+            obj for key, obj in old.items() if key in new] + created
+
+    def _invalidate_on_commit(self, recipe):
+        """Сбрасывает кеш рецепта после фиксации транзакции: сигнал
+           post_save срабатывает до записи тегов и ингредиентов, и
+           параллельный запрос мог закешировать рецепт без них."""
+        transaction.on_commit(lambda: invalidate_recipes((recipe.pk, )))
 
     def _summ_values_same_fields(self, ingredients):
         """Суммуриует значения поля 'amount' одинаковых ингредиентов."""
@@ -248,15 +354,21 @@ class RecipeSerializer(serializers.ModelSerializer):
                                     text=validated_data['text'],
                                     cooking_time=validated_data['cooking_time']
                                     )
-
-        ingredients = self._summ_values_same_fields(validated_data.pop(
-                                                    'ingredients'))
-        self._save_tags_or_ingredients(IngredientRecipeSerializer, ingredients,
-                                       'ingredient', obj)
-
-        tags = list(set(validated_data.pop('tags')))
-        self._save_tags_or_ingredients(TagRecipeSerializer, tags, 'tag', obj)
-
+        obj.is_favorited = False
+        obj.is_in_shopping_cart = False
+        obj.author_is_subscribed = False
+        obj.saved_relations = {}
+
+        self._save_tags_or_ingredients(
+            IngredientRecipe,
+            [{'ingredient': ingredient['ingredient'],
+              'amount': ingredient['amount']}
+             for ingredient in validated_data.pop('ingredients')],
+            'ingredient', obj)
+        self._save_tags_or_ingredients(
+            TagRecipe, [{'tag': tag} for tag in validated_data.pop('tags')],
+            'tag', obj)
+        self._invalidate_on_commit(obj)
         return obj
 
     @transaction.atomic
@@ -265,42 +377,53 @@ class RecipeSerializer(serializers.ModelSerializer):
         instance.name = validated_data.get('name')
         instance.text = validated_data.get('text')
         instance.cooking_time = validated_data.get('cooking_time')
+        instance.saved_relations = {}
 
         new_image = validated_data.get('image')
         if new_image:
             instance.image = validated_data.get('image')
 
-        ingredients = self._summ_values_same_fields(validated_data.pop(
-                                                    'ingredients'))
-        self._save_tags_or_ingredients(IngredientRecipeSerializer,
-                                       ingredients, 'ingredient',
-                                       instance)
-
-        tags = validated_data.pop('tags')
-        self._save_tags_or_ingredients(TagRecipeSerializer, tags, 'tag',
-                                       instance)
+        self._save_tags_or_ingredients(
+            IngredientRecipe,
+            [{'ingredient': ingredient['ingredient'],
+              'amount': ingredient['amount']}
+             for ingredient in validated_data.pop('ingredients')],
+            'ingredient', instance)
+        self._save_tags_or_ingredients(
+            TagRecipe, [{'tag': tag} for tag in validated_data.pop('tags')],
+            'tag', instance)
 
         instance.save()
+        self._invalidate_on_commit(instance)
         return instance
 
     def to_representation(self, obj):
-        """Добавляет к ингредиентам поле кол-ва."""
-        data = RecipeReadOnlySerializer(
+        """Возвращает рецепт с ингредиентами и их кол-вом.
+           Сохранённые теги и ингредиенты берутся из уже загруженных
+           объектов, без повторных запросов."""
+        saved_relations = getattr(obj, 'saved_relations', None)
+        if saved_relations:
+            obj._prefetched_objects_cache = dict(saved_relations)
+        return RecipeReadOnlySerializer(
             obj, context={'request': self.context.get('request')}).data
-        ingredients = data.get('ingredients')
-        for ingredient in ingredients:
-            ingredient['amount'] = (
-                    IngredientRecipe.objects.get(
-                        recipe=data.get('id'), ingredient=ingredient.get('id')
-                        ).amount
-                 )
-        return data
 
     def validate_tags(self, data):
-        return validate_tags_ingredients(data)
+        return list(dict.fromkeys(validate_tags_ingredients(data)))
 
     def validate_ingredients(self, data):
-        return validate_tags_ingredients(data)
+        """Суммирует одинаковые ингредиенты и находит их
+           одним запросом."""
+        data = self._summ_values_same_fields(validate_tags_ingredients(data))
+        ingredients = Ingredient.objects.in_bulk(
+            [ingredient['id'] for ingredient in data])
+        validate_unknown_ids([ingredient['id'] for ingredient in data
+                              if ingredient['id'] not in ingredients])
+        for ingredient in data:
+            validate_amount(ingredient['amount'], settings.AMOUNT_MIN_VALUE,
+                            settings.AMOUNT_MAX_VALUE,
+                            'Количество ингредиента')
+            ingredient['ingredient'] = ingredients[ingredient['id']]
+        return data
 
     def validate_cooking_time(self, data):
         return validate_cooking_time(data, settings.COOKING_TIME_MIN_VALUE,
@@ -308,12 +431,54 @@ class RecipeSerializer(serializers.ModelSerializer):
                                      'Время готовки')
 
     def validate(self, data):
-        """Валидирует поля при PATCH-запросе."""
+        """При PATCH-запросе обязательны все поля, кроме фото. Фото уже
+           проверено по заголовку и повторно не читается."""
         if self.context.get('request').method == 'PATCH':
-            RecipePATCHSerializer(data=data).is_valid(raise_exception=True)
+            missing = {
+                name: [self.fields[name].error_messages['required']]
+                for name in self.patch_required_fields if name not in data}
+            if missing:
+                raise serializers.ValidationError(missing)
         return data
 
 
+class RecipeImageSerializer(ImageSaveMixin, serializers.ModelSerializer):
+    """Serializer фото рецепта, переданного телом запроса."""
+
+    image = Base64ImageField()
+
+    class Meta:
+        fields = ('image', )
+        model = Recipe
+
+    def to_representation(self, obj):
+        """Возвращает рецепт целиком."""
+        return RecipeReadOnlySerializer(
+            obj, context={'request': self.context.get('request')}).data
+
+
+class SubscribeListSerializer(serializers.ListSerializer):
+    """Загружает рецепты всех авторов страницы одним запросом."""
+
+    def to_representation(self, data):
+        subscriptions = list(data)
+        recipes_limit = self.child._get_recipes_limit()
+        recipes = Recipe.objects.filter(author__in={
+            subscription.author_id for subscription in subscriptions})
+        if recipes_limit is not None:
+            recipes = recipes.annotate(row_number=Window(
+                RowNumber(), partition_by=F('author'),
+                order_by=(F('pub_date').desc(), F('pk').desc()),
+            )).filter(row_number__lte=recipes_limit)
+        recipes_by_author = {}
+        for recipe in recipes.order_by('-pub_date', '-pk'):
+            recipes_by_author.setdefault(recipe.author_id, []).append(recipe)
+        for subscription in subscriptions:
+            subscription.author.latest_recipes = recipes_by_author.get(
+                subscription.author_id, [])
+        return super().to_representation(subscriptions)
+
+
 class SubscribeSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -323,6 +488,7 @@ class SubscribeSerializer(serializers.ModelSerializer):
             'user': {'required': False},
             'author': {'required': False},
         }
+        list_serializer_class = SubscribeListSerializer
 
     def _get_recipes_limit(self):
         """Получает кол-во выводимых рецептов из параметра."""
@@ -334,14 +500,17 @@ class SubscribeSerializer(serializers.ModelSerializer):
         return recipes_limit
 
     def to_representation(self, obj):
-        """Возвращает автора, на которого подписались."""
-        recipes_limit = self._get_recipes_limit()
-        recipes = RecipeReadOnlyFavoriteShoppingSubscribeSerializer(
-            obj.author.recipes.all()[:recipes_limit], many=True
-        ).data
+        """Возвращает автора, на которого подписались.
+           Подписка на автора есть по определению, поэтому
+           признак подписки не запрашивается."""
+        recipes = getattr(obj.author, 'latest_recipes', None)
+        if recipes is None:
+            recipes = obj.author.recipes.all()[:self._get_recipes_limit()]
+        obj.author.is_subscribed = True
         data = UserSubscribeSerializer(obj.author,
                                        context={'request': obj}).data
-        data['recipes'] = recipes
+        data['recipes'] = RecipeReadOnlyFavoriteShoppingSubscribeSerializer(
+            recipes, many=True).data
         return data
 
     def validate(self, data):
@@ -0,0 +1,506 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from app.models import (Favorite, FeedItem, Ingredient, IngredientRecipe,
+                        Recipe, ShoppingCart, Tag, TagRecipe)
+from core.authentication import token_cache
+from core.registry import tag_registry
+from core.search import ingredient_index
+from users.models import Subscribe, User
+
+PNG = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+       'AAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==')
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def get_recipe_payload(ingredients, tags, name='Рецепт'):
+    """Тело запроса на создание/изменение рецепта."""
+    return {
+        'ingredients': [{'id': ingredient.pk, 'amount': 5}
+                        for ingredient in ingredients],
+        'tags': [tag.pk for tag in tags],
+        'image': PNG,
+        'name': name,
+        'text': 'Описание',
+        'cooking_time': 10,
+    }
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTest(APITestCase):
+    """Кол-во SQL-запросов эндпоинтов не превышает бюджет
+       и не растёт с кол-вом строк в выдаче."""
+
+    budget = 12
+    count_recipes = 60
+    count_ingredients = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create(
+            User(username=f'budget_{i}', email=f'budget_{i}@budget.ru',
+                 first_name='Имя', last_name='Фамилия')
+            for i in range(20)
+        )
+        cls.user = cls.users[0]
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f'budget_{i}', color=f'#budg{i:02}', slug=f'budget_{i}')
+            for i in range(5)
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'budget_{i}', measurement_unit='г')
+            for i in range(cls.count_ingredients * 5)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=cls.users[i % len(cls.users)],
+                   name=f'budget_{i}', text='Описание',
+                   image='recipes/img/budget.png', cooking_time=10)
+            for i in range(cls.count_recipes)
+        )
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag)
+            for index, recipe in enumerate(recipes)
+            for tag in cls.tags[:index % len(cls.tags) + 1]
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, amount=amount + 1,
+                             ingredient=cls.ingredients[
+                                 (index + amount) % len(cls.ingredients)])
+            for index, recipe in enumerate(recipes)
+            for amount in range(cls.count_ingredients)
+        )
+        Favorite.objects.bulk_create(
+            Favorite(recipe=recipe, user=cls.user) for recipe in recipes[::2])
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(recipe=recipe, user=cls.user)
+            for recipe in recipes[::3])
+        Subscribe.objects.bulk_create(
+            Subscribe(user=cls.user, author=author)
+            for author in cls.users[1:])
+        cls.recipe = recipes[0]
+        cls.free_recipe = recipes[1]
+        cls.free_author = User.objects.create(
+            username='budget_free', email='budget_free@budget.ru',
+            first_name='Имя', last_name='Фамилия')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Кеш и реестры заполняются заново: их загрузка
+           не должна попасть в замеренный запрос."""
+        cache.clear()
+        token_cache.clear()
+        tag_registry.warm()
+        ingredient_index.warm()
+        self.client.force_authenticate(self.user)
+        self.anonymous = APIClient()
+
+    def _count(self, client, method, url, data=None):
+        """Кол-во SQL-запросов одного запроса."""
+        kwargs = {'data': data, 'format': 'json'} if data else {}
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, f'{method} {url}')
+        return len(context)
+
+    def _recipe_payload(self, count):
+        return get_recipe_payload(self.ingredients[:count], self.tags[:count])
+
+    def test_lists_do_not_grow_with_page_size(self):
+        lists = (
+            (self.anonymous, '/api/recipes/?limit={}'),
+            (self.client, '/api/recipes/?limit={}'),
+            (self.client, '/api/recipes/?limit={}&cursor='),
+            (self.client,
+             '/api/recipes/?limit={}&is_favorited=1&is_in_shopping_cart=1'
+             '&tags=budget_0&tags=budget_1&tags=budget_2'),
+            (self.client,
+             '/api/recipes/?limit={}&author=%d' % self.users[1].pk),
+            (self.client, '/api/recipes/feed/?limit={}'),
+            (self.client, '/api/users/subscriptions/?limit={}'),
+            (self.client,
+             '/api/users/subscriptions/?limit=5&recipes_limit={}'),
+            (self.client, '/api/users/?limit={}'),
+            (self.anonymous, '/api/users/?limit={}'),
+        )
+        for client, url in lists:
+            with self.subTest(url=url, anonymous=client is self.anonymous):
+                count = self._count(client, 'get', url.format(1))
+                self.assertLessEqual(count, self.budget)
+                with self.assertNumQueries(count):
+                    client.get(url.format(20))
+
+    def test_single_objects_within_budget(self):
+        pages = (
+            (self.anonymous, f'/api/recipes/{self.recipe.pk}/'),
+            (self.client, f'/api/recipes/{self.recipe.pk}/'),
+            (self.client, '/api/tags/'),
+            (self.client, f'/api/tags/{self.tags[0].pk}/'),
+            (self.client, '/api/ingredients/?name=budget'),
+            (self.client, f'/api/ingredients/{self.ingredients[0].pk}/'),
+            (self.client, f'/api/users/{self.users[1].pk}/'),
+            (self.client, '/api/users/me/'),
+            (self.client, '/api/recipes/download_shopping_cart/'),
+        )
+        for client, url in pages:
+            with self.subTest(url=url, anonymous=client is self.anonymous):
+                self.assertLessEqual(self._count(client, 'get', url),
+                                     self.budget)
+
+    def test_actions_within_budget(self):
+        urls = (
+            f'/api/recipes/{self.free_recipe.pk}/favorite/',
+            f'/api/recipes/{self.free_recipe.pk}/shopping_cart/',
+            f'/api/users/{self.free_author.pk}/subscribe/',
+        )
+        for url in urls:
+            for method in ('post', 'delete'):
+                with self.subTest(url=url, method=method):
+                    self.assertLessEqual(
+                        self._count(self.client, method, url), self.budget)
+
+    def test_recipe_writes_do_not_grow_with_ingredients(self):
+        many = len(self.ingredients)
+        count = self._count(self.client, 'post', '/api/recipes/',
+                            self._recipe_payload(1))
+        self.assertLessEqual(count, self.budget)
+        with self.assertNumQueries(count):
+            self.client.post('/api/recipes/', self._recipe_payload(many),
+                             format='json')
+
+        created = Recipe.objects.filter(author=self.user).first()
+        url = f'/api/recipes/{created.pk}/'
+        count = self._count(self.client, 'patch', url,
+                            self._recipe_payload(1))
+        self.assertLessEqual(count, self.budget)
+        # Удаление, обновление и добавление ингредиентов выполняются,
+        # только если в запросе есть такие изменения: запросов может
+        # стать меньше, но не больше.
+        self.assertLessEqual(
+            self._count(self.client, 'patch', url,
+                        self._recipe_payload(many)), count)
+        self.assertLessEqual(self._count(self.client, 'delete', url),
+                             self.budget)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeCacheTest(APITestCase):
+    """Кеш списка и деталей рецептов для анонимных пользователей
+       сбрасывается изменением рецепта и связанных с ним данных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='cache_author', email='cache_author@cache.ru',
+            first_name='Имя', last_name='Фамилия')
+        cls.tag = Tag.objects.create(name='cache', color='#cache0',
+                                     slug='cache')
+        cls.ingredient = Ingredient.objects.create(name='cache',
+                                                   measurement_unit='г')
+        other_author = User.objects.create(
+            username='cache_other', email='cache_other@cache.ru',
+            first_name='Имя', last_name='Фамилия')
+        cls.recipe, cls.other = Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'cache_{i}', text='Описание',
+                   image='recipes/img/cache.png', cooking_time=10)
+            for i, author in enumerate((cls.author, other_author))
+        )
+        TagRecipe.objects.create(recipe=cls.recipe, tag=cls.tag)
+        IngredientRecipe.objects.create(recipe=cls.recipe, amount=1,
+                                        ingredient=cls.ingredient)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.list_url = '/api/recipes/?limit=10'
+        self.detail_url = f'/api/recipes/{self.recipe.pk}/'
+        self.other_url = f'/api/recipes/{self.other.pk}/'
+        for url in (self.list_url, self.detail_url, self.other_url):
+            self.assertCached(url, 'MISS')
+            self.assertCached(url, 'HIT')
+
+    def assertCached(self, url, expected):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], expected, url)
+        return response
+
+    def test_recipe_update_resets_list_and_recipe(self):
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                self.detail_url, get_recipe_payload(
+                    (self.ingredient, ), (self.tag, ), name='Новое имя'),
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(None)
+
+        self.assertCached(self.list_url, 'MISS')
+        self.assertEqual(
+            self.assertCached(self.detail_url, 'MISS').data['name'],
+            'Новое имя')
+        self.assertCached(self.other_url, 'HIT')
+
+    def test_recipe_delete_resets_list(self):
+        self.other.delete()
+        response = self.assertCached(self.list_url, 'MISS')
+        self.assertEqual([recipe['id'] for recipe in response.data['results']],
+                         [self.recipe.pk])
+
+    def test_related_changes_reset_recipe(self):
+        changes = (
+            (self.tag, 'name', 'Новый тег'),
+            (self.ingredient, 'name', 'Новый ингредиент'),
+            (self.author, 'first_name', 'Новое имя'),
+        )
+        for obj, field, value in changes:
+            with self.subTest(model=type(obj).__name__):
+                setattr(obj, field, value)
+                obj.save()
+                self.assertCached(self.list_url, 'MISS')
+                self.assertCached(self.detail_url, 'MISS')
+                self.assertCached(self.other_url, 'HIT')
+
+    def test_authenticated_user_bypasses_cache(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.get(self.list_url)
+        self.assertNotIn('X-Cache', response)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CounterTest(APITestCase):
+    """Счётчики избранного, рецептов и подписок меняются вместе
+       со связями и сверяются с фактическими данными."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = User.objects.bulk_create(
+            User(username=f'counter_{i}', email=f'counter_{i}@counter.ru',
+                 first_name='Имя', last_name='Фамилия')
+            for i in range(2)
+        )
+        cls.tag = Tag.objects.create(name='counter', color='#count0',
+                                     slug='counter')
+        cls.ingredient = Ingredient.objects.create(name='counter',
+                                                   measurement_unit='г')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='counter', text='Описание',
+            image='recipes/img/counter.png', cooking_time=10)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def assertCounters(self, **expected):
+        counters = {}
+        for name, value in expected.items():
+            obj_name, field = name.split('__')
+            obj = getattr(self, obj_name)
+            obj.refresh_from_db(fields=(field, ))
+            counters[name] = getattr(obj, field)
+        self.assertEqual(counters, expected)
+
+    def test_favorites_count(self):
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertCounters(recipe__favorites_count=1)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertCounters(recipe__favorites_count=1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertCounters(recipe__favorites_count=0)
+
+    def test_followers_and_following_count(self):
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertCounters(author__followers_count=1,
+                            user__following_count=1,
+                            author__following_count=0,
+                            user__followers_count=0)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertCounters(author__followers_count=0,
+                            user__following_count=0)
+
+    def test_recipes_count(self):
+        response = self.client.post(
+            '/api/recipes/', get_recipe_payload((self.ingredient, ),
+                                                (self.tag, )),
+            format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertCounters(user__recipes_count=1, author__recipes_count=1)
+        response = self.client.delete(f'/api/recipes/{response.data["id"]}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertCounters(user__recipes_count=0, author__recipes_count=1)
+
+    def test_counter_does_not_go_below_zero(self):
+        User.objects.filter(pk=self.author.pk).update(followers_count=0)
+        Subscribe.objects.create(user=self.user, author=self.author)
+        User.objects.filter(pk=self.author.pk).update(followers_count=0)
+        Subscribe.objects.filter(user=self.user).delete()
+        self.assertCounters(author__followers_count=0)
+
+    def test_reconcile_counters_fixes_drift(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(favorites_count=7)
+        User.objects.filter(pk=self.author.pk).update(recipes_count=0)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.assertCounters(recipe__favorites_count=1,
+                            author__recipes_count=1,
+                            user__recipes_count=0)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, FEED_FANOUT_MIN_FOLLOWING=2,
+                   FEED_BACKFILL_PER_AUTHOR=2)
+class FeedTest(APITestCase):
+    """Лента из таблицы FeedItem заполняется при подписке и публикации
+       рецепта, чистится при отписке и совпадает с лентой через
+       author IN (...) в пределах последних рецептов авторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.reader, *cls.authors = User.objects.bulk_create(
+            User(username=f'feed_{i}', email=f'feed_{i}@feed.ru',
+                 first_name='Имя', last_name='Фамилия')
+            for i in range(5)
+        )
+        cls.recipes = {
+            author.pk: Recipe.objects.bulk_create(
+                Recipe(author=author, name=f'feed_{i}', text='Описание',
+                       image='recipes/img/feed.png', cooking_time=10)
+                for i in range(3)
+            )
+            for author in cls.authors
+        }
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def get_items(self, user):
+        return set(FeedItem.objects.filter(user=user).values_list(
+            'recipe', flat=True))
+
+    def get_latest(self, *authors):
+        return {recipe.pk for author in authors
+                for recipe in self.recipes[author.pk][-2:]}
+
+    def get_feed(self):
+        response = self.client.get('/api/recipes/feed/?limit=100')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def subscribe(self, user, author):
+        Subscribe.objects.create(user=user, author=author)
+
+    def unsubscribe(self, user, author):
+        Subscribe.objects.get(user=user, author=author).delete()
+
+    def test_feed_below_threshold_is_not_stored(self):
+        self.subscribe(self.user, self.authors[0])
+        self.assertEqual(self.get_items(self.user), set())
+        self.assertEqual(self.get_feed(), [recipe.pk for recipe in reversed(
+            self.recipes[self.authors[0].pk])])
+
+    def test_subscribe_fills_feed(self):
+        self.subscribe(self.user, self.authors[0])
+        self.subscribe(self.user, self.authors[1])
+        self.assertEqual(self.get_items(self.user),
+                         self.get_latest(*self.authors[:2]))
+        self.subscribe(self.user, self.authors[2])
+        self.assertEqual(self.get_items(self.user),
+                         self.get_latest(*self.authors))
+        feed = self.get_feed()
+        self.assertEqual(set(feed), self.get_latest(*self.authors))
+        self.assertEqual(feed, sorted(feed, reverse=True))
+
+    def test_new_recipe_fans_out(self):
+        for author in self.authors[:2]:
+            self.subscribe(self.user, author)
+        self.subscribe(self.reader, self.authors[0])
+        recipe = Recipe.objects.create(
+            author=self.authors[0], name='feed_new', text='Описание',
+            image='recipes/img/feed.png', cooking_time=10)
+        self.assertIn(recipe.pk, self.get_items(self.user))
+        self.assertEqual(self.get_items(self.reader), set())
+        self.assertEqual(self.get_feed()[0], recipe.pk)
+
+    def test_unsubscribe_clears_feed(self):
+        for author in self.authors:
+            self.subscribe(self.user, author)
+        self.unsubscribe(self.user, self.authors[2])
+        self.assertEqual(self.get_items(self.user),
+                         self.get_latest(*self.authors[:2]))
+        self.unsubscribe(self.user, self.authors[1])
+        self.assertEqual(self.get_items(self.user), set())
+        self.assertEqual(set(self.get_feed()),
+                         {recipe.pk for recipe in
+                          self.recipes[self.authors[0].pk]})
+
+
+class TokenCacheTest(APITestCase):
+    """Повторные запросы с тем же токеном не читают его из БД,
+       а выход, смена пароля и деактивация сбрасывают кеш."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='token', email='token@token.ru', password='Пароль-1',
+            first_name='Имя', last_name='Фамилия')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self, status=200):
+        """Кол-во запросов к таблице токенов при запросе профиля."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, status)
+        return sum(Token._meta.db_table in query['sql']
+                   for query in context.captured_queries)
+
+    def test_second_request_does_not_read_token(self):
+        self.assertEqual(self.get_me(), 1)
+        self.assertEqual(self.get_me(), 0)
+
+    def test_entry_expires(self):
+        timeout = token_cache.timeout
+        token_cache.timeout = 0
+        self.addCleanup(setattr, token_cache, 'timeout', timeout)
+        self.get_me()
+        self.assertEqual(self.get_me(), 1)
+
+    def test_logout_resets_cache(self):
+        self.get_me()
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.get_me(status=401)
+
+    def test_password_change_and_deactivation_reset_cache(self):
+        self.get_me()
+        self.user.first_name = 'Новое имя'
+        self.user.save(update_fields=('first_name', ))
+        self.assertEqual(self.get_me(), 0)
+
+        self.user.set_password('Пароль-2')
+        self.user.save()
+        self.assertEqual(self.get_me(), 1)
+
+        self.user.is_active = False
+        self.user.save(update_fields=('is_active', ))
+        self.get_me(status=401)
@@ -1,33 +1,53 @@
-from django.db.models import Sum
-from django.conf import settings
-from django.http import HttpResponse
+from django.db.models import Exists, OuterRef, Prefetch, Sum, Value
+from django.http import (Http404, HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
+from djoser.views import UserViewSet as DjoserUserViewSet
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from api.serializers import (FavoriteSerializer, IngredientSerializer,
-                             RecipeSerializer, ShoppingCartSerializer,
-                             SubscribeSerializer, TagSerializer)
+                             RecipeImageSerializer, RecipeSerializer,
+                             ShoppingCartSerializer, SubscribeSerializer,
+                             TagSerializer)
 from app.models import (Favorite, Ingredient, IngredientRecipe,
-                        Recipe, ShoppingCart, Tag)
+                        Recipe, ShoppingCart)
 from core.actions import action_shopping_cart_fovorite
+from core.cache import get_content_hash, pdf_cache
+from core.export import EXPORT_FORMATS
+from core.feed import get_feed_queryset, get_following_count, uses_fanout
 from core.filters import IngredientSearchFilter, RecipeFilter
-from core.mixins import PDF, ListDestroyCreateModelViewSet
-from core.permissions import (AuthorOrReadOnlyPermission,
+from core.jobs import DONE, PENDING, render_jobs
+from core.metrics import metrics
+from core.mixins import (AnonymousCacheMixin, ListDestroyCreateModelViewSet,
+                         SerializerTimingMixin)
+from core.pagination import OptionalCursorPagination
+from core.parsers import ImageParser
+from core.pdf import render_shopping_list
+from core.permissions import (AuthorOrReadOnlyPermission, MetricsPermission,
                               ReadFileIsAuthenticatedPermission)
+from core.registry import tag_registry
 from users.models import Subscribe
 
 
-class SubscribeViewSet(ListDestroyCreateModelViewSet):
+class SubscribeViewSet(SerializerTimingMixin, ListDestroyCreateModelViewSet):
     permission_classes = (IsAuthenticated, )
     serializer_class = SubscribeSerializer
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('-id', )
 
     def get_queryset(self):
-        """Отдаёт объекты для вывода."""
-        return self.request.user.follower.all()
+        """Отдаёт подписки вместе с авторами."""
+        return self.request.user.follower.select_related(
+            'author').order_by('-id')
 
     def get_object(self):
         """Отдаёт объект для удаления."""
@@ -38,13 +58,36 @@ class SubscribeViewSet(ListDestroyCreateModelViewSet):
         return get_object_or_404(Subscribe, author=author, user=user)
 
 
-class TagViewSet(viewsets.ModelViewSet):
-    queryset = Tag.objects.all()
+class UserViewSet(SerializerTimingMixin, DjoserUserViewSet):
+
+    def get_queryset(self):
+        """Отдаёт пользователей с признаком подписки текущего
+           пользователя, без запроса на каждого пользователя."""
+        user = self.request.user
+        queryset = super().get_queryset().order_by('id')
+        if not user.is_authenticated:
+            return queryset.annotate(is_subscribed=Value(False))
+        return queryset.annotate(is_subscribed=Exists(
+            Subscribe.objects.filter(user=user.pk, author=OuterRef('pk'))))
+
+
+class TagViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = TagSerializer
     http_method_names = ('get', )
 
+    def get_queryset(self):
+        """Отдаёт теги из реестра тегов."""
+        return tag_registry.all()
+
+    def get_object(self):
+        """Отдаёт тег из реестра тегов."""
+        tag = tag_registry.get(self.kwargs.get('pk'))
+        if tag is None:
+            raise Http404
+        return tag
+
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientSearchFilter, )
@@ -52,14 +95,69 @@ class IngredientViewSet(viewsets.ModelViewSet):
     http_method_names = ('get', )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
+class RecipeViewSet(AnonymousCacheMixin, SerializerTimingMixin,
+                    viewsets.ModelViewSet):
     permission_classes = (AuthorOrReadOnlyPermission, )
     serializer_class = RecipeSerializer
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
+    pagination_class = OptionalCursorPagination
+    parser_classes = (JSONParser, MultiPartParser, )
     http_method_names = ('get', 'post', 'patch', 'delete', )
 
+    def get_queryset(self):
+        """Отдаёт рецепты со всеми данными для вывода
+           за постоянное кол-во запросов. Удалению они не нужны."""
+        user = self.request.user
+        if self.action == 'destroy':
+            return Recipe.objects.select_related('author')
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags_recipe',
+            Prefetch('ingredients_recipe',
+                     queryset=IngredientRecipe.objects.select_related(
+                         'ingredient')),
+        )
+        if not user.is_authenticated:
+            return queryset.annotate(is_favorited=Value(False),
+                                     is_in_shopping_cart=Value(False),
+                                     author_is_subscribed=Value(False))
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                recipe=OuterRef('pk'), user=user)),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                recipe=OuterRef('pk'), user=user)),
+            author_is_subscribed=Exists(Subscribe.objects.filter(
+                author=OuterRef('author'), user=user)),
+        )
+
+    @action(methods=('GET', ), detail=False, url_path='feed',
+            url_name='feed', permission_classes=(IsAuthenticated, ))
+    def feed(self, request):
+        """Отдаёт рецепты авторов, на которых подписан пользователь.
+           При большом кол-ве подписок лента читается из таблицы FeedItem."""
+        self.cursor_ordering = ('-feed_pub_date', '-id', )
+        queryset = get_feed_queryset(
+            request.user.pk, self.filter_queryset(self.get_queryset()),
+            uses_fanout(get_following_count(request.user.pk)))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(
+                self.get_serializer_data(serializer))
+        return Response(self.get_serializer_data(
+            self.get_serializer(queryset, many=True)))
+
+    @action(methods=('PUT', ), detail=True, url_path='image',
+            url_name='image', parser_classes=(ImageParser, ),
+            serializer_class=RecipeImageSerializer,
+            http_method_names=('put', ))
+    def put_image(self, request, pk):
+        """Заменяет фото рецепта телом запроса без base64."""
+        serializer = self.get_serializer(self.get_object(), data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(self.get_serializer_data(serializer))
+
     @action(methods=('POST', 'DELETE', ),
             detail=True, url_path='favorite', url_name='favorite',)
     def post_del_favorite(self, request, pk):
@@ -80,38 +178,89 @@ class ShoppingCartView(APIView):
 
     permission_classes = (ReadFileIsAuthenticatedPermission, )
 
-    def _get_pdf_file_as_byte_str(self, ingredients):
-        """Отдаёт PDF-файл в виде байт-строки."""
-        pdf = PDF()
-        pdf.alias_nb_pages()
-        pdf.add_page()
-        pdf.set_title('Ingredients')
-        pdf.set_author('Yaremenko V.V.')
-        pdf.set_font(settings.FONT, '', settings.SIZE_FONT)
-
-        line_number = 1
-        pdf.cell(settings.CELL_WIDTH, settings.CELL_HEIGNT,
-                 txt='   Необходимые ингредиенты:', ln=settings.LINE)
-        for ingredient in ingredients:
-            pdf.cell(settings.CELL_WIDTH, settings.CELL_HEIGNT,
-                     ln=settings.LINE,
-                     txt=(f'         {line_number}) '
-                          f'{ingredient["ingredient__name"]}'
-                          f'({ingredient["ingredient__measurement_unit"]})'
-                          f'— {ingredient["amount"]}'),)
-            line_number += 1
-
-        return pdf.output(dest='S').encode('latin-1')
-
     def _get_info_ingredients(self, user):
         """Получает информацию об ингредиентах в рецептах."""
         recipes = user.shopping_cart_user.values('recipe').all()
         return IngredientRecipe.objects.filter(recipe__in=recipes).values(
                         'ingredient__name', 'ingredient__measurement_unit'
-                        ).annotate(amount=Sum('amount'))
+                        ).annotate(amount=Sum('amount')).order_by(
+                        'ingredient__name', 'ingredient__measurement_unit')
+
+    def perform_content_negotiation(self, request, force=False):
+        """Параметр format задаёт формат списка, а не рендерер DRF."""
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        """Отдаёт файл с необходимыми ингредиентами для покупки
+           в формате из параметра format, по умолчанию PDF."""
+        export_format = request.query_params.get('format', 'pdf')
+        if export_format == 'pdf':
+            return self._get_pdf(request)
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'format': [
+                f'Допустимые форматы: pdf, {", ".join(EXPORT_FORMATS)}.']})
+        stream, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            stream(self._get_info_ingredients(request.user)),
+            content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{export_format}"')
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def post(self, request):
+        """Ставит рендер PDF-файла в фоновую очередь и отдаёт id задачи.
+           Повторная отправка того же списка вернёт ту же задачу."""
+        job_id = render_jobs.submit(
+            request.user, list(self._get_info_ingredients(request.user)))
+        job = render_jobs.get(request.user, job_id)
+        return Response(
+            {'id': job_id, 'status': job['status'] if job else PENDING},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': request.build_absolute_uri(job_id + '/')})
+
+    def _get_pdf(self, request):
+        """Отдаёт PDF-файл. Файл кешируется по хешу списка
+           ингредиентов, который отдаётся как ETag."""
+        ingredients = list(self._get_info_ingredients(request.user))
+        etag = quote_etag(get_content_hash('pdf', ingredients))
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            pdf = pdf_cache.get(etag)
+            if pdf is None:
+                pdf = render_shopping_list(ingredients)
+                pdf_cache.set(etag, pdf)
+            response = HttpResponse(pdf, content_type='application/pdf')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class ShoppingCartJobView(APIView):
+
+    permission_classes = (ReadFileIsAuthenticatedPermission, )
+
+    def get(self, request, job_id):
+        """Отдаёт статус задачи рендера, а готовый PDF-файл — сразу."""
+        job = render_jobs.get(request.user, job_id)
+        if job is None:
+            raise Http404
+        if job['status'] != DONE:
+            return Response(
+                {'id': job_id, 'status': job['status']},
+                status=(status.HTTP_202_ACCEPTED
+                        if job['status'] == PENDING else status.HTTP_200_OK))
+        response = HttpResponse(job['file'], content_type='application/pdf')
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class MetricsView(APIView):
+
+    permission_classes = (MetricsPermission, )
 
     def get(self, request):
-        """Отдаёт файл с необходимыми ингредиентами для покупки."""
-        ingredients = self._get_info_ingredients(request.user)
-        pdf = self._get_pdf_file_as_byte_str(ingredients)
-        return HttpResponse(pdf, content_type='application/pdf')
+        """Отдаёт гистограммы маршрутов в формате Prometheus."""
+        return HttpResponse(metrics.render(),
+                            content_type='text/plain; version=0.0.4')
@@ -2,6 +2,7 @@ from django.contrib import admin
 
 from app.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                         ShoppingCart, Tag, TagRecipe)
+from core.cache import invalidate_recipes
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -53,10 +54,15 @@ class RecipeAdmin(admin.ModelAdmin):
 
     def get_count_favorite(self, obj):
         """Кол-во добавлений рецепта в избранное."""
-        return Favorite.objects.filter(recipe=obj.pk).count()
+        return obj.favorites_count
 
     get_count_favorite.short_description = ('Кол-во в избранном')
 
+    def save_related(self, request, form, formsets, change):
+        """Сбрасывает кеш рецепта после сохранения тегов и ингредиентов."""
+        super().save_related(request, form, formsets, change)
+        invalidate_recipes((form.instance.pk, ))
+
 
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('pk', 'recipe', 'user')
@@ -72,13 +78,32 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class TagRecipeAdmin(admin.ModelAdmin):
+class RecipeRelationAdmin(admin.ModelAdmin):
+    """Сбрасывает кеш рецептов при изменении их тегов и ингредиентов:
+       у моделей связей нет сигналов, чтобы их удаление шло
+       одним запросом."""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_recipes((obj.recipe_id, ))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_recipes((obj.recipe_id, ))
+
+    def delete_queryset(self, request, queryset):
+        recipes = set(queryset.values_list('recipe', flat=True))
+        super().delete_queryset(request, queryset)
+        invalidate_recipes(recipes)
+
+
+class TagRecipeAdmin(RecipeRelationAdmin):
     list_display = ('pk', 'recipe', 'tag')
     search_fields = ('recipe__name', 'tag__name', )
     empty_value_display = '-пусто-'
 
 
-class IngredientRecipeAdmin(admin.ModelAdmin):
+class IngredientRecipeAdmin(RecipeRelationAdmin):
     list_display = ('pk', 'recipe', 'ingredient', 'amount')
     search_fields = ('recipe__name', 'recipe__author__username',
                      'recipe__author__email')
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnails_for',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Фото, для которого созданы уменьшенные копии'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.1 on 2026-10-18 19:43
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Сводит повторно загруженные ингредиенты к одной записи,
+       рецепты переходят на оставшуюся запись."""
+    Ingredient = apps.get_model('app', 'Ingredient')
+    IngredientRecipe = apps.get_model('app', 'IngredientRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit').annotate(
+            keep=Min('pk'), count=Count('pk')).filter(count__gt=1)
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(pk=duplicate['keep'])
+        IngredientRecipe.objects.filter(ingredient__in=extra).update(
+            ingredient=duplicate['keep'])
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
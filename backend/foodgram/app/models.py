@@ -54,6 +54,10 @@ class Ingredient(models.Model):
         return self.name
 
     class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('name', 'measurement_unit'),
+                                    name='unique_ingredient'),
+        )
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -65,7 +69,8 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
         related_name='recipes',
         verbose_name='Автор',
-        help_text='Автор'
+        help_text='Автор',
+        db_index=False,
     )
 
     name = models.CharField(
@@ -85,6 +90,13 @@ class Recipe(models.Model):
         upload_to='recipes/img/',
     )
 
+    thumbnails_for = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        verbose_name='Фото, для которого созданы уменьшенные копии',
+    )
+
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время готовки(минуты)',
         help_text='Время готовки(минуты)',
@@ -96,6 +108,12 @@ class Recipe(models.Model):
         verbose_name='Дата публикации'
     )
 
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кол-во в избранном',
+    )
+
     tags = models.ManyToManyField(Tag, related_name='recipes',
                                   verbose_name='Теги',
                                   through='TagRecipe')
@@ -109,6 +127,12 @@ class Recipe(models.Model):
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='recipe_author_pub_date_id'),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -117,6 +141,7 @@ class TagRecipe(models.Model):
     """Модель связи М:М тегов и рецептов."""
     tag = models.ForeignKey(Tag, related_name='tag_recipes',
                             verbose_name='Тег',
+                            db_index=False,
                             on_delete=models.PROTECT)
     recipe = models.ForeignKey(Recipe, related_name='tags_recipe',
                                verbose_name='Рецепт',
@@ -126,6 +151,10 @@ class TagRecipe(models.Model):
         return f'{self.tag} {self.recipe}'
 
     class Meta:
+        indexes = (
+            models.Index(fields=('tag', 'recipe'),
+                         name='tag_recipe_tag_recipe'),
+        )
         verbose_name = 'Тег-Рецепт'
         verbose_name_plural = 'Теги-Рецепты'
 
@@ -136,6 +165,7 @@ class IngredientRecipe(models.Model):
                                    related_name='ingredient_recipes',
                                    verbose_name='Ингредиент',
                                    help_text='Ингредиент',
+                                   db_index=False,
                                    on_delete=models.PROTECT)
     recipe = models.ForeignKey(Recipe, related_name='ingredients_recipe',
                                verbose_name='Рецепт',
@@ -151,6 +181,10 @@ class IngredientRecipe(models.Model):
         return f'{self.ingredient} {self.recipe}  {self.amount}'
 
     class Meta:
+        indexes = (
+            models.Index(fields=('ingredient', 'recipe'),
+                         name='ingredient_recipe_ingredient'),
+        )
         verbose_name = 'Ингредиент-Рецепт'
         verbose_name_plural = 'Ингредиенты-Рецепты'
 
@@ -199,3 +233,32 @@ class ShoppingCart(models.Model):
         )
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class FeedItem(models.Model):
+    """Рецепт в ленте подписчика, записанный при публикации рецепта."""
+    user = models.ForeignKey(User, related_name='feed_items',
+                             verbose_name='Подписчик',
+                             on_delete=models.CASCADE)
+    author = models.ForeignKey(User, related_name='+',
+                               verbose_name='Автор',
+                               on_delete=models.CASCADE)
+    recipe = models.ForeignKey(Recipe, related_name='feed_items',
+                               verbose_name='Рецепт',
+                               on_delete=models.CASCADE)
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    def __str__(self):
+        return f'{self.recipe} {self.user}'
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'recipe'),
+                                    name='unique_feed_item'),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-recipe'),
+                         name='feed_item_user_pub_date'),
+        )
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Ленты подписок'
@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app.models import Favorite, Ingredient, Recipe, Tag
+from core.cache import invalidate_recipes
+from core.counters import change_counter
+from core.feed import fan_out_recipe, subscribe, unsubscribe
+from core.images import delete_image_sizes, image_sizes
+from core.registry import tag_registry
+from core.search import ingredient_index
+from users.models import Subscribe, User
+
+AUTHOR_FIELDS = frozenset(('email', 'username', 'first_name', 'last_name', ))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    """Сбрасывает кеш рецепта."""
+    invalidate_recipes((instance.pk, ))
+
+
+@receiver(post_save, sender=Recipe)
+def make_recipe_image_sizes(sender, instance, **kwargs):
+    """Ставит в очередь уменьшенные копии нового фото рецепта
+       и удаляет копии заменённого фото."""
+    if instance.image and instance.thumbnails_for != instance.image.name:
+        if instance.thumbnails_for:
+            replaced = instance.thumbnails_for
+            transaction.on_commit(lambda: delete_image_sizes(replaced))
+        image_sizes.schedule(instance.pk, instance.image.name)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tag(sender, instance, **kwargs):
+    """Сбрасывает реестр тегов и кеш рецептов с тегом."""
+    tag_registry.invalidate()
+    invalidate_recipes(instance.tag_recipes.values_list('recipe',
+                                                        flat=True))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient(sender, instance, **kwargs):
+    """Сбрасывает поисковый индекс и кеш рецептов с ингредиентом."""
+    ingredient_index.invalidate()
+    invalidate_recipes(instance.ingredient_recipes.values_list('recipe',
+                                                               flat=True))
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_author(sender, instance, update_fields=None, **kwargs):
+    """Сбрасывает кеш рецептов автора, если изменились
+       выводимые в рецепте поля."""
+    if update_fields and not AUTHOR_FIELDS & set(update_fields):
+        return
+    invalidate_recipes(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def count_favorites(sender, instance, created=False, **kwargs):
+    """Обновляет счётчик добавлений рецепта в избранное."""
+    if kwargs['signal'] is post_delete or created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count',
+                       1 if created else -1)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def count_recipes(sender, instance, created=False, **kwargs):
+    """Обновляет счётчик рецептов автора."""
+    if kwargs['signal'] is post_delete or created:
+        change_counter(User, instance.author_id, 'recipes_count',
+                       1 if created else -1)
+
+
+@receiver((post_save, post_delete), sender=Subscribe)
+def count_followers(sender, instance, created=False, **kwargs):
+    """Обновляет счётчики подписчиков автора и подписок пользователя."""
+    if kwargs['signal'] is post_delete or created:
+        change_counter(User, instance.author_id, 'followers_count',
+                       1 if created else -1)
+        change_counter(User, instance.user_id, 'following_count',
+                       1 if created else -1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, **kwargs):
+    """Записывает новый рецепт в ленты подписчиков автора."""
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver((post_save, post_delete), sender=Subscribe)
+def update_feed(sender, instance, created=False, **kwargs):
+    """Дополняет или чистит ленту пользователя после подписки
+       и отписки. Выполняется после обновления счётчика подписок."""
+    if created:
+        subscribe(instance.user_id, instance.author_id)
+    elif kwargs['signal'] is post_delete:
+        unsubscribe(instance.user_id, instance.author_id)
@@ -2,6 +2,8 @@ from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
 
+from core.metrics import serializer_timer
+
 
 def action_shopping_cart_fovorite(request, pk, serializer, model):
     """Action добавления/удаления подписок, покупок."""
@@ -11,8 +13,9 @@ def action_shopping_cart_fovorite(request, pk, serializer, model):
     serializer.is_valid(raise_exception=True)
     if request.method == 'POST':
         serializer.save()
-        return Response(serializer.data,
-                        status=status.HTTP_201_CREATED)
+        with serializer_timer():
+            data = serializer.data
+        return Response(data, status=status.HTTP_201_CREATED)
     elif request.method == 'DELETE':
         get_object_or_404(model, recipe=pk,
                           user=request.user).delete()
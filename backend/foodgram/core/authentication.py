@@ -0,0 +1,78 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from core.cache import bump_version, get_version
+
+
+class TokenCache:
+    """LRU-кеш пользователей по токену в памяти процесса.
+       Запись живёт не дольше timeout и сбрасывается сменой версии
+       токена в кеше Django: версия читается до запроса к БД, поэтому
+       сброс во время запроса не оставит старую запись. Другие процессы
+       видят сброс только при общем бэкенде кеша, иначе их записи
+       устаревают по timeout, поэтому он короткий."""
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_version_key(self, key):
+        """Ключ версии токена, сам токен в общий кеш не попадает."""
+        return f'auth:token:version:{sha256(key.encode()).hexdigest()}'
+
+    def get(self, key, version):
+        """Пользователь и токен, если запись актуальна."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            user, token, entry_version, expires = entry
+            if entry_version != version or expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        return copy.copy(user), token
+
+    def set(self, key, version, user, token):
+        with self._lock:
+            self._data[key] = (user, token, version,
+                               time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Сбрасывает запись токена."""
+        bump_version(self.get_version_key(key))
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE,
+                         settings.AUTH_TOKEN_CACHE_TIMEOUT)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену DRF с кешем пользователей:
+       повторные запросы с тем же токеном не обращаются к БД."""
+
+    def authenticate_credentials(self, key):
+        version = get_version(token_cache.get_version_key(key))
+        cached = token_cache.get(key, version)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, version, user, token)
+        return copy.copy(user), token
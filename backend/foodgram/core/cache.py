@@ -0,0 +1,131 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from hashlib import md5, sha256
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+LIST_VERSION_KEY = 'recipes:list:version'
+HITS_KEY = 'recipes:cache:hits'
+MISSES_KEY = 'recipes:cache:misses'
+
+
+def increment(key):
+    """Атомарно увеличивает счётчик в кеше."""
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def get_version(key):
+    """Текущая версия данных. Если ключ вытеснен из кеша, новая версия
+       начинается со времени, чтобы не совпасть с прежними."""
+    return cache.get_or_set(key, time.time_ns, timeout=None)
+
+
+def bump_version(key):
+    """Меняет версию данных, сбрасывая всё, что было ей помечено."""
+    if cache.add(key, time.time_ns(), timeout=None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def get_origin(request):
+    """Схема и хост запроса: ответ содержит абсолютные ссылки,
+       построенные по ним."""
+    return f'{request.scheme}://{request.get_host()}'
+
+
+def get_list_key(request):
+    """Ключ кеша списка рецептов по хосту, пути, фильтрам и странице."""
+    version = get_version(LIST_VERSION_KEY)
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = md5(f'{get_origin(request)}{request.path}?{query}'.encode()
+                 ).hexdigest()
+    return f'recipes:list:{version}:{digest}'
+
+
+def get_detail_version_key(pk):
+    """Ключ версии кеша рецепта, общей для всех хостов."""
+    return f'recipes:detail:version:{pk}'
+
+
+def get_detail_key(request, pk):
+    """Ключ кеша рецепта по хосту и версии рецепта."""
+    version = get_version(get_detail_version_key(pk))
+    digest = md5(get_origin(request).encode()).hexdigest()
+    return f'recipes:detail:{pk}:{version}:{digest}'
+
+
+def get_response_data(key):
+    """Отдаёт данные ответа из кеша и учитывает попадание/промах."""
+    data = cache.get(key)
+    increment(MISSES_KEY if data is None else HITS_KEY)
+    return data
+
+
+def set_response_data(key, data):
+    """Сохраняет данные ответа в кеш."""
+    cache.set(key, data, timeout=settings.RECIPES_CACHE_TIMEOUT)
+
+
+def invalidate_recipes(pks=()):
+    """Сбрасывает все списки рецептов и указанные рецепты на всех
+       хостах: без ключа версии рецепт получает новую версию."""
+    bump_version(LIST_VERSION_KEY)
+    cache.delete_many([get_detail_version_key(pk) for pk in pks])
+
+
+def get_stats():
+    """Счётчики попаданий и промахов кеша."""
+    hits, misses = (cache.get(key, 0) for key in (HITS_KEY, MISSES_KEY))
+    return {'hits': hits, 'misses': misses}
+
+
+def get_content_hash(*parts):
+    """Хеш содержимого, по которому оно кешируется."""
+    content = json.dumps(parts, ensure_ascii=False, sort_keys=True,
+                         default=str)
+    return sha256(content.encode()).hexdigest()
+
+
+class LRUBytesCache:
+    """LRU-кеш байт-строк в памяти процесса,
+       ограниченный их суммарным размером."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self.size -= len(self._data.pop(key))
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+
+pdf_cache = LRUBytesCache(settings.PDF_CACHE_MAX_BYTES)
@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from app.models import Recipe
+from users.models import User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', 'favorites_recipe'),
+    (User, 'recipes_count', 'recipes'),
+    (User, 'followers_count', 'following'),
+    (User, 'following_count', 'follower'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счётчик одним UPDATE, не уходя ниже нуля."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def reconcile_counter(model, field, relation, batch_size):
+    """Сверяет счётчик с фактическим кол-вом связанных строк пачками
+       по batch_size объектов. Строки пачки блокируются на время сверки,
+       чтобы не потерять параллельные изменения счётчика.
+       Отдаёт кол-во исправленных объектов."""
+    fixed = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            pks = list(model.objects.select_for_update().filter(
+                pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', flat=True)[:batch_size])
+            if not pks:
+                return fixed
+            drifted = [
+                model(pk=pk, **{field: actual})
+                for pk, actual in model.objects.filter(pk__in=pks).annotate(
+                    actual=Count(relation)).exclude(
+                        **{field: F('actual')}).values_list('pk', 'actual')
+            ]
+            model.objects.bulk_update(drifted, (field, ))
+        fixed += len(drifted)
+        last_pk = pks[-1]
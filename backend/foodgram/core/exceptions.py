@@ -0,0 +1,25 @@
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from core.validators import UNKNOWN_ID
+
+
+def restore_unknown_ids(data):
+    """Возвращает неизвестные id числами: ValidationError
+       приводит все значения ошибок к строкам."""
+    if isinstance(data, dict):
+        return {key: restore_unknown_ids(value)
+                for key, value in data.items()}
+    if isinstance(data, list):
+        return [restore_unknown_ids(value) for value in data]
+    if isinstance(data, ErrorDetail) and data.code == UNKNOWN_ID:
+        return int(data)
+    return data
+
+
+def exception_handler(exc, context):
+    """Обработчик ошибок DRF с числовыми неизвестными id."""
+    response = drf_exception_handler(exc, context)
+    if response is not None:
+        response.data = restore_unknown_ids(response.data)
+    return response
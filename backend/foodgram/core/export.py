@@ -0,0 +1,54 @@
+import csv
+import json
+
+from django.conf import settings
+
+
+class Echo:
+    """Буфер для csv.writer: отдаёт строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iterate(ingredients):
+    """Строки агрегата ингредиентов через серверный курсор."""
+    return ingredients.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def stream_text(ingredients):
+    """Список покупок построчно в текстовом виде."""
+    yield 'Необходимые ингредиенты:\n'
+    for line_number, ingredient in enumerate(iterate(ingredients), 1):
+        yield (f'{line_number}) {ingredient["ingredient__name"]}'
+               f' ({ingredient["ingredient__measurement_unit"]})'
+               f' — {ingredient["amount"]}\n')
+
+
+def stream_csv(ingredients):
+    """Список покупок построчно в CSV."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in iterate(ingredients):
+        yield writer.writerow((ingredient['ingredient__name'],
+                               ingredient['ingredient__measurement_unit'],
+                               ingredient['amount']))
+
+
+def stream_json(ingredients):
+    """Список покупок JSON-массивом, по одному объекту на шаг."""
+    separator = '['
+    for ingredient in iterate(ingredients):
+        yield separator + json.dumps(
+            {'name': ingredient['ingredient__name'],
+             'measurement_unit': ingredient['ingredient__measurement_unit'],
+             'amount': ingredient['amount']}, ensure_ascii=False)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+EXPORT_FORMATS = {
+    'txt': (stream_text, 'text/plain; charset=utf-8'),
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'json': (stream_json, 'application/json'),
+}
@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from app.models import FeedItem, Recipe
+from users.models import Subscribe, User
+
+
+def uses_fanout(following_count):
+    """Лента читается из таблицы FeedItem, если подписок много."""
+    return following_count >= settings.FEED_FANOUT_MIN_FOLLOWING
+
+
+def get_following_count(user_pk):
+    """Актуальное кол-во подписок пользователя из БД."""
+    return User.objects.filter(pk=user_pk).values_list(
+        'following_count', flat=True).first() or 0
+
+
+def get_feed_queryset(user_pk, queryset, fanout):
+    """Рецепты авторов, на которых подписан пользователь, от новых к старым.
+       fanout — из таблицы FeedItem, иначе через author IN (...)."""
+    if fanout:
+        return queryset.filter(feed_items__user=user_pk).annotate(
+            feed_pub_date=F('feed_items__pub_date')).order_by(
+                '-feed_pub_date', '-id')
+    return queryset.filter(author__in=Subscribe.objects.filter(
+        user=user_pk).values('author')).annotate(
+            feed_pub_date=F('pub_date')).order_by('-feed_pub_date', '-id')
+
+
+def _create_items(items):
+    """Сохраняет записи ленты пачками, пропуская уже существующие."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == settings.FEED_FANOUT_BATCH:
+            FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _get_latest_recipes(authors):
+    """Последние FEED_BACKFILL_PER_AUTHOR рецептов каждого автора."""
+    return Recipe.objects.filter(author__in=authors).annotate(
+        row_number=Window(RowNumber(), partition_by=F('author'),
+                          order_by=(F('pub_date').desc(), F('pk').desc())),
+    ).filter(row_number__lte=settings.FEED_BACKFILL_PER_AUTHOR).values_list(
+        'pk', 'author', 'pub_date')
+
+
+def backfill_feed(user_pk, authors):
+    """Добавляет в ленту последние рецепты авторов."""
+    _create_items(FeedItem(user_id=user_pk, author_id=author, recipe_id=pk,
+                           pub_date=pub_date)
+                  for pk, author, pub_date in _get_latest_recipes(authors))
+
+
+def rebuild_feed(user_pk):
+    """Собирает ленту пользователя заново по его подпискам."""
+    with transaction.atomic():
+        FeedItem.objects.filter(user=user_pk).delete()
+        backfill_feed(user_pk, Subscribe.objects.filter(
+            user=user_pk).values('author'))
+
+
+def fan_out_recipe(recipe):
+    """Записывает новый рецепт в ленты подписчиков автора,
+       читающих ленту из таблицы."""
+    readers = Subscribe.objects.filter(
+        author=recipe.author_id,
+        user__following_count__gte=settings.FEED_FANOUT_MIN_FOLLOWING,
+    ).values_list('user', flat=True).iterator(
+        chunk_size=settings.FEED_FANOUT_BATCH)
+    _create_items(FeedItem(user_id=user, author_id=recipe.author_id,
+                           recipe_id=recipe.pk, pub_date=recipe.pub_date)
+                  for user in readers)
+
+
+def subscribe(user_pk, author_pk):
+    """Дополняет ленту после подписки. Пользователь, достигший
+       порога подписок, получает ленту из таблицы целиком."""
+    following_count = get_following_count(user_pk)
+    if following_count == settings.FEED_FANOUT_MIN_FOLLOWING:
+        rebuild_feed(user_pk)
+    elif uses_fanout(following_count):
+        backfill_feed(user_pk, (author_pk, ))
+
+
+def unsubscribe(user_pk, author_pk):
+    """Убирает рецепты автора из ленты после отписки, а ленту
+       пользователя, опустившегося ниже порога, — целиком."""
+    items = FeedItem.objects.filter(user=user_pk)
+    if uses_fanout(get_following_count(user_pk)):
+        items = items.filter(author=author_pk)
+    items.delete()
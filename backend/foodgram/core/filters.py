@@ -1,41 +1,59 @@
-from django_filters import FilterSet, ModelMultipleChoiceFilter, NumberFilter
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django_filters import FilterSet, MultipleChoiceFilter, NumberFilter
 from rest_framework.filters import SearchFilter
 
-from app.models import Recipe, Tag
+from app.models import Favorite, Recipe, ShoppingCart, TagRecipe
+from core.registry import tag_registry
+from core.search import ingredient_index
 
 
 class RecipeFilter(FilterSet):
-    """Фильтр рецептов."""
-    tags = ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug')
-    is_favorited = NumberFilter(field_name='favorites_recipe__user',
-                                method='is_favorited_filter')
-    is_in_shopping_cart = NumberFilter(field_name='shopping_cart_recipe__user',
-                                       method='is_in_shopping_cart_filter')
+    """Фильтр рецептов. Теги, избранное и список покупок проверяются
+       подзапросами EXISTS: выдача не размножается JOIN-ами
+       и не требует DISTINCT. Автор сравнивается по id без запроса
+       к пользователям."""
+    author = NumberFilter(field_name='author')
+    tags = MultipleChoiceFilter(choices=tag_registry.slug_choices,
+                                method='tags_filter')
+    is_favorited = NumberFilter(method='is_favorited_filter')
+    is_in_shopping_cart = NumberFilter(method='is_in_shopping_cart_filter')
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags', )
 
-    def is_favorited_filter(self, queryset, name, value):
-        """Фильтр рецпта по избранному."""
+    def tags_filter(self, queryset, name, value):
+        """Фильтр рецепта по slug-ам тегов из реестра тегов."""
+        tags = [tag_registry.get_by_slug(slug) for slug in value]
+        return queryset.filter(Exists(TagRecipe.objects.filter(
+            recipe=OuterRef('pk'), tag__in=tags)))
+
+    def _user_filter(self, queryset, model, value):
+        """Фильтр рецепта по связи с текущим пользователем."""
         if value == 1 and self.request.user.is_authenticated:
-            return queryset.filter(**{
-                name: self.request.user,
-            })
+            return queryset.filter(Exists(model.objects.filter(
+                recipe=OuterRef('pk'), user=self.request.user)))
         return queryset
 
+    def is_favorited_filter(self, queryset, name, value):
+        """Фильтр рецпта по избранному."""
+        return self._user_filter(queryset, Favorite, value)
+
     def is_in_shopping_cart_filter(self, queryset, name, value):
         """Фильтр рецпта по списку покупок."""
-        if value == 1 and self.request.user.is_authenticated:
-            return queryset.filter(**{
-                name: self.request.user,
-            })
-        return queryset
+        return self._user_filter(queryset, ShoppingCart, value)
 
 
 class IngredientSearchFilter(SearchFilter):
-    """Изменяет назнавие параметра для поиска."""
+    """Изменяет назнавие параметра для поиска.
+       Ищет по индексу ингредиентов: сначала по началу названия,
+       затем по вхождению, не более INGREDIENT_SEARCH_LIMIT результатов."""
     search_param = ('name')
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '')
+        if view.action != 'list' or not term.strip():
+            return queryset
+        return ingredient_index.search(term,
+                                       settings.INGREDIENT_SEARCH_LIMIT)
@@ -0,0 +1,162 @@
+import base64
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from app.models import Recipe
+from core.cache import invalidate_recipes
+
+
+class ImageLimitError(ValueError):
+    """Изображение превышает допустимый размер."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def check_image(file):
+    """Проверяет изображение по заголовку, не декодируя пиксели.
+       Отдаёт формат изображения."""
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            image_format = image.format
+    except Image.DecompressionBombError:
+        raise ImageLimitError('max_pixels')
+    except OSError:
+        raise ValueError('invalid_image')
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ImageLimitError('max_pixels')
+    file.seek(0)
+    return image_format
+
+
+def decode_base64_image(data):
+    """Декодирует base64 по частям во временный файл.
+       Размер проверяется до декодирования, число пикселей — по заголовку."""
+    header, data = data.split(';base64,')
+    if len(data) * 3 // 4 > settings.IMAGE_MAX_BYTES:
+        raise ImageLimitError('max_bytes')
+    file = TemporaryUploadedFile('temp', header.split(':')[-1], 0, None)
+    try:
+        for start in range(0, len(data), settings.IMAGE_DECODE_CHUNK):
+            file.write(base64.b64decode(
+                data[start:start + settings.IMAGE_DECODE_CHUNK],
+                validate=True))
+        file.size = file.tell()
+        file.name = f'temp.{check_image(file).lower()}'
+    except ValueError:
+        file.close()
+        raise
+    return file
+
+
+def check_uploaded_image(file):
+    """Проверяет загруженный файл изображения до его декодирования."""
+    if file.size > settings.IMAGE_MAX_BYTES:
+        raise ImageLimitError('max_bytes')
+    file.name = f'temp.{check_image(file).lower()}'
+    return file
+
+
+def read_image(stream, content_type, length):
+    """Читает тело запроса по частям во временный файл,
+       прерывая чтение при превышении размера."""
+    if length > settings.IMAGE_MAX_BYTES:
+        raise ImageLimitError('max_bytes')
+    file = TemporaryUploadedFile('temp', content_type, 0, None)
+    while chunk := stream.read(settings.IMAGE_DECODE_CHUNK):
+        file.write(chunk)
+        if file.tell() > settings.IMAGE_MAX_BYTES:
+            file.close()
+            raise ImageLimitError('max_bytes')
+    file.size = file.tell()
+    return file
+
+
+def get_size_name(name, size):
+    """Путь к уменьшенной копии фото."""
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, size, f'{filename}.webp')
+
+
+def delete_image_sizes(name):
+    """Удаляет уменьшенные копии фото."""
+    for size in settings.IMAGE_SIZES:
+        default_storage.delete(get_size_name(name, size))
+
+
+def make_image_sizes(pk, name):
+    """Создаёт WebP-копии фото рецепта и отмечает их готовность.
+       Если фото успели заменить, копии удаляются."""
+    sizes = sorted(settings.IMAGE_SIZES.items(), key=lambda size: -size[1])
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image.draft('RGB', (sizes[0][1], sizes[0][1]))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert(
+                'RGBA' if 'A' in image.mode or 'transparency' in image.info
+                else 'RGB')
+        for size, side in sizes:
+            image.thumbnail((side, side))
+            buffer = BytesIO()
+            image.save(buffer, 'WEBP', quality=settings.IMAGE_QUALITY)
+            size_name = get_size_name(name, size)
+            default_storage.delete(size_name)
+            default_storage.save(size_name, ContentFile(buffer.getvalue()))
+    if Recipe.objects.filter(pk=pk, image=name).update(thumbnails_for=name):
+        invalidate_recipes((pk, ))
+    else:
+        delete_image_sizes(name)
+
+
+class ImageSizes:
+    """Фоновое создание уменьшенных копий фото в пуле потоков:
+       Pillow отпускает GIL на декодировании и сжатии."""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _run(self, pk, name):
+        close_old_connections()
+        try:
+            make_image_sizes(pk, name)
+        finally:
+            close_old_connections()
+
+    def schedule(self, pk, name):
+        """Ставит фото в очередь после фиксации транзакции."""
+        transaction.on_commit(
+            lambda: self._get_executor().submit(self._run, pk, name))
+
+    def wait(self):
+        """Дожидается копий, уже поставленных в очередь.
+           Следующая загрузка создаст новый пул."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _get_executor(self):
+        """Пул потоков, создаётся при первой загрузке фото."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=settings.IMAGE_WORKERS,
+                        thread_name_prefix='image-sizes')
+        return self._executor
+
+
+image_sizes = ImageSizes()
@@ -0,0 +1,92 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import get_content_hash
+from core.pdf import render_shopping_list
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class RenderJobs:
+    """Фоновый рендер PDF списков покупок в пуле процессов.
+       Задачи хранятся в кеше Django: при общем бэкенде кеша статус
+       виден из любого воркера gunicorn. Одинаковые задачи одного
+       пользователя, пока они не завершились с ошибкой, не дублируются."""
+
+    key_prefix = 'shopping_cart:job'
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        """Пул процессов, создаётся при первой задаче."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.PDF_RENDER_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup)
+            return self._executor
+
+    def _reset_executor(self):
+        """Отбрасывает пул, процесс которого аварийно завершился."""
+        with self._lock:
+            self._executor = None
+
+    def _get_key(self, job_id):
+        return f'{self.key_prefix}:{job_id}'
+
+    def _save(self, job_id, user, status, file=None):
+        cache.set(self._get_key(job_id),
+                  {'status': status, 'user': user, 'file': file},
+                  settings.PDF_JOB_TIMEOUT)
+
+    def submit(self, user, ingredients):
+        """Ставит рендер в очередь и отдаёт id задачи."""
+        job_id = get_content_hash('shopping_cart', user.pk, ingredients)
+        pending = {'status': PENDING, 'user': user.pk, 'file': None}
+        if not cache.add(self._get_key(job_id), pending,
+                         settings.PDF_JOB_TIMEOUT):
+            job = self.get(user, job_id)
+            if job is not None and job['status'] != FAILED:
+                return job_id
+            self._save(job_id, user.pk, PENDING)
+        try:
+            future = self._get_executor().submit(render_shopping_list,
+                                                 ingredients)
+        except BrokenProcessPool:
+            self._reset_executor()
+            self._save(job_id, user.pk, FAILED)
+        else:
+            future.add_done_callback(partial(self._finish, job_id, user.pk))
+        return job_id
+
+    def _finish(self, job_id, user, future):
+        """Сохраняет результат задачи."""
+        try:
+            self._save(job_id, user, DONE, future.result())
+        except BrokenProcessPool:
+            self._reset_executor()
+            self._save(job_id, user, FAILED)
+        except Exception:
+            self._save(job_id, user, FAILED)
+
+    def get(self, user, job_id):
+        """Задача пользователя или None."""
+        job = cache.get(self._get_key(job_id))
+        if job is None or job['user'] != user.pk:
+            return None
+        return job
+
+
+render_jobs = RenderJobs()
@@ -0,0 +1,193 @@
+import json
+import statistics
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app.models import Ingredient, Recipe, Tag
+from core.sandbox import sandbox
+from users.models import User
+
+PNG = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+       'AAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==')
+PREFIX = 'benchmark_api'
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа и кол-во SQL-запросов основных '
+            'эндпоинтов на тестовых данных, сохраняет результат '
+            'как базовый или сравнивает с базовым')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=30,
+                            help='Кол-во замеров каждого запроса')
+        parser.add_argument('--baseline', default='api_benchmark.json',
+                            help='JSON-файл с базовыми результатами')
+        parser.add_argument('--save', action='store_true',
+                            help='Сохранить результат как базовый')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост медианы, доля')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Меньший рост медианы, мс, '
+                                 'считается шумом')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.results = {}
+        with sandbox():
+            self._seed(options)
+            self._benchmark_all()
+
+        meta = {key: options[key]
+                for key in ('users', 'recipes', 'seed', 'repeat')}
+        if options['save']:
+            with open(options['baseline'], 'w', encoding='UTF-8') as file:
+                json.dump({'meta': meta, 'results': self.results}, file,
+                          ensure_ascii=False, indent=2)
+            self.stdout.write(f'Базовый результат: {options["baseline"]}')
+            return
+        try:
+            with open(options['baseline'], encoding='UTF-8') as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            self.stdout.write('Базового результата нет, сохраните его '
+                              'с --save')
+            return
+        if baseline['meta'] != meta:
+            raise CommandError(f'Базовый результат получен с другими '
+                               f'параметрами: {baseline["meta"]}')
+        self._compare(baseline['results'], options['threshold'],
+                      options['min_delta_ms'])
+
+    def _seed(self, options):
+        """Наполняет БД и выбирает пользователя для запросов."""
+        call_command('seed_load_data', users=options['users'],
+                     recipes=options['recipes'], seed=options['seed'],
+                     prefix=PREFIX, stdout=StringIO())
+        self.user = User.objects.filter(
+            username__startswith=f'{PREFIX}_').order_by(
+                '-following_count', 'pk').first()
+        self.author = User.objects.filter(
+            username__startswith=f'{PREFIX}_').order_by(
+                '-recipes_count', 'pk').first()
+        self.recipe = Recipe.objects.filter(author=self.author).first()
+        self.free_recipe = Recipe.objects.exclude(
+            favorites_recipe__user=self.user).exclude(
+                shopping_cart_recipe__user=self.user).last()
+        self.tags = list(Tag.objects.filter(slug__startswith=PREFIX)[:3])
+        self.ingredients = list(Ingredient.objects.all()[:10])
+        self.client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        self.client.credentials(HTTP_AUTHORIZATION=(
+            f'Token {Token.objects.create(user=self.user).key}'))
+
+    def _recipe_payload(self):
+        return {
+            'ingredients': [{'id': ingredient.pk, 'amount': 5}
+                            for ingredient in self.ingredients],
+            'tags': [tag.pk for tag in self.tags],
+            'image': PNG,
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+        }
+
+    def _benchmark_all(self):
+        """Замеряет все сценарии."""
+        recipe, free = self.recipe.pk, self.free_recipe.pk
+        tags = '&'.join(f'tags={tag.slug}' for tag in self.tags)
+        reads = (
+            ('recipes', '/api/recipes/?limit=6'),
+            ('recipes cursor', '/api/recipes/?limit=6&cursor='),
+            ('recipes by tags', f'/api/recipes/?limit=6&{tags}'),
+            ('recipes favorited',
+             '/api/recipes/?limit=6&is_favorited=1&is_in_shopping_cart=1'),
+            ('recipes by author',
+             f'/api/recipes/?limit=6&author={self.author.pk}'),
+            ('recipe', f'/api/recipes/{recipe}/'),
+            ('feed', '/api/recipes/feed/?limit=6'),
+            ('subscriptions', '/api/users/subscriptions/?limit=6'),
+            ('ingredient search', '/api/ingredients/?name=сах'),
+            ('shopping list pdf', '/api/recipes/download_shopping_cart/'),
+            ('shopping list txt',
+             '/api/recipes/download_shopping_cart/?format=txt'),
+        )
+        for name, url in reads:
+            self._measure(name, (('get', url, None), ))
+
+        for action in ('favorite', 'shopping_cart'):
+            url = f'/api/recipes/{free}/{action}/'
+            self._measure(f'{action} toggle',
+                          (('post', url, None), ('delete', url, None)))
+        self._measure('recipe create',
+                      (('post', '/api/recipes/', self._recipe_payload()), ))
+        created = Recipe.objects.filter(author=self.user).first().pk
+        self._measure('recipe patch', (
+            ('patch', f'/api/recipes/{created}/', self._recipe_payload()), ))
+
+    def _request(self, requests):
+        """Выполняет запросы сценария, отдаёт время (мс) и запросы к БД."""
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            for method, url, data in requests:
+                kwargs = {'data': data, 'format': 'json'} if data else {}
+                response = getattr(self.client, method)(url, **kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                if response.status_code >= 400:
+                    raise CommandError(f'{method.upper()} {url}: '
+                                       f'статус {response.status_code}')
+            elapsed = (time.perf_counter() - start) * 1000
+        return elapsed, len(context)
+
+    def _measure(self, name, requests):
+        """Распределение времени ответа сценария."""
+        self._request(requests)
+        timings, queries = [], 0
+        for _ in range(self.repeat):
+            elapsed, queries = self._request(requests)
+            timings.append(elapsed)
+        timings.sort()
+        result = {
+            'p50': statistics.median(timings),
+            'p95': timings[min(len(timings) - 1,
+                               int(len(timings) * 0.95))],
+            'max': timings[-1],
+            'mean': statistics.fmean(timings),
+            'queries': queries,
+        }
+        self.results[name] = result
+        self.stdout.write(f'{name:<22} p50 {result["p50"]:>8.2f} мс  '
+                          f'p95 {result["p95"]:>8.2f} мс  '
+                          f'запросов {queries:>3}')
+
+    def _compare(self, baseline, threshold, min_delta):
+        """Сравнивает медианы и кол-во запросов с базовыми."""
+        regressions = []
+        for name, result in self.results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            delta = result['p50'] - base['p50']
+            if delta > min_delta and delta > base['p50'] * threshold:
+                regressions.append(
+                    f'{name}: p50 {base["p50"]:.2f} -> {result["p50"]:.2f} '
+                    f'мс (+{delta / base["p50"]:.0%})')
+            if result['queries'] > base['queries']:
+                regressions.append(
+                    f'{name}: запросов {base["queries"]} -> '
+                    f'{result["queries"]}')
+        if regressions:
+            raise CommandError('Регрессия относительно базового '
+                               'результата:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS(
+            'Регрессий относительно базового результата нет'))
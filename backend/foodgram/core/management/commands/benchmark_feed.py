@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import FeedItem, Recipe
+from core.feed import get_feed_queryset, rebuild_feed
+from core.sandbox import sandbox
+from users.models import Subscribe, User
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает чтение ленты подписок через author IN (...) '
+            'и из таблицы FeedItem при росте кол-ва авторов в подписках')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, nargs='+',
+                            default=(10, 100, 1000),
+                            help='Кол-во авторов в подписках')
+        parser.add_argument('--recipes', type=int, default=20,
+                            help='Кол-во рецептов каждого автора')
+        parser.add_argument('--limit', type=int, default=6,
+                            help='Кол-во рецептов на странице')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Кол-во повторов каждого замера')
+
+    def handle(self, *args, **options):
+        authors = sorted(options['authors'])
+        with sandbox(FEED_BACKFILL_PER_AUTHOR=options['recipes']):
+            self._seed(authors[-1], options['recipes'])
+            self.stdout.write(f'{"авторов":>8} {"IN, мс":>8} '
+                              f'{"таблица, мс":>12} {"строк ленты":>12} '
+                              f'{"сборка, мс":>11}')
+            for count in authors:
+                self._benchmark(count, options['limit'], options['repeat'])
+
+    def _seed(self, count_authors, count_recipes):
+        """Создаёт читателя, авторов и их рецепты."""
+        self.reader = User.objects.create(
+            username='benchmark_feed', email='benchmark_feed@feed.ru',
+            first_name='Имя', last_name='Фамилия')
+        self.authors = User.objects.bulk_create(
+            User(username=f'benchmark_feed_{i}',
+                 email=f'benchmark_feed_{i}@feed.ru',
+                 first_name='Имя', last_name='Фамилия')
+            for i in range(count_authors))
+        Recipe.objects.bulk_create(
+            (Recipe(author=author, name=f'benchmark_feed_{i}',
+                    text='Описание', image='recipes/img/benchmark.png',
+                    cooking_time=10)
+             for i in range(count_recipes) for author in self.authors),
+            batch_size=1000,
+        )
+
+    def _measure(self, fanout, limit, repeat):
+        """Медиана времени чтения первой страницы ленты (мс)."""
+        queryset = get_feed_queryset(self.reader.pk, Recipe.objects.all(),
+                                     fanout).values_list('pk', flat=True)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            page = list(queryset[:limit])
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), page
+
+    def _benchmark(self, count, limit, repeat):
+        """Подписывает читателя на count авторов и замеряет обе ленты."""
+        Subscribe.objects.filter(user=self.reader).delete()
+        Subscribe.objects.bulk_create(
+            Subscribe(user=self.reader, author=author)
+            for author in self.authors[:count])
+        start = time.perf_counter()
+        rebuild_feed(self.reader.pk)
+        rebuild_ms = (time.perf_counter() - start) * 1000
+        in_ms, in_page = self._measure(False, limit, repeat)
+        table_ms, table_page = self._measure(True, limit, repeat)
+        if in_page != table_page:
+            raise CommandError(f'Ленты расходятся: {in_page} и {table_page}')
+        rows = FeedItem.objects.filter(user=self.reader).count()
+        self.stdout.write(f'{count:>8} {in_ms:>8.2f} {table_ms:>12.2f} '
+                          f'{rows:>12} {rebuild_ms:>11.1f}')
@@ -0,0 +1,114 @@
+import base64
+import json
+import os
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from app.models import Ingredient, Recipe, Tag
+from core.sandbox import sandbox
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость загрузки фото рецепта и пик памяти: '
+            'base64 в JSON, multipart/form-data и PUT тела запроса')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=float, default=5,
+                            help='Размер фото, МБ')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        image = self._get_image(int(options['size'] * 1024 * 1024))
+        self.factory = APIRequestFactory()
+        with sandbox():
+            self._seed()
+            self.stdout.write(f'Фото: {len(image) / 1024 / 1024:.1f} МБ')
+            self.stdout.write(f'{"способ":>10} {"тело, МБ":>9} '
+                              f'{"МБ/с":>8} {"пик памяти, МБ":>15}')
+            for title, request in (('base64', self._base64),
+                                   ('multipart', self._multipart),
+                                   ('PUT', self._put)):
+                self._report(title, request, image, options['repeat'])
+
+    def _get_image(self, size):
+        """PNG из случайных пикселей: почти не сжимается."""
+        side = int((size / 3) ** 0.5)
+        buffer = BytesIO()
+        Image.frombytes('RGB', (side, side),
+                        os.urandom(side * side * 3)).save(buffer, 'PNG',
+                                                          compress_level=1)
+        return buffer.getvalue()
+
+    def _seed(self):
+        """Создаёт автора и рецепт для замеров."""
+        self.user = User.objects.create(username='benchmark_upload',
+                                        email='benchmark_upload@upload.ru',
+                                        first_name='Имя',
+                                        last_name='Фамилия')
+        self.tag = Tag.objects.create(name='benchmark_upload',
+                                      color='#upload', slug='upload')
+        self.ingredient = Ingredient.objects.create(name='benchmark_upload',
+                                                    measurement_unit='г')
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='benchmark_upload', text='Описание',
+            image='recipes/img/benchmark.png', cooking_time=10)
+
+    def _fields(self):
+        return {'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10}
+
+    def _base64(self, image):
+        body = json.dumps(dict(
+            self._fields(), tags=[self.tag.pk],
+            ingredients=[{'id': self.ingredient.pk, 'amount': 1}],
+            image='data:image/png;base64,' + base64.b64encode(image).decode()))
+        return (self.factory.post('/api/recipes/', body,
+                                  content_type='application/json'),
+                RecipeViewSet.as_view({'post': 'create'}), {}, len(body))
+
+    def _multipart(self, image):
+        request = self.factory.post('/api/recipes/', dict(
+            self._fields(), tags=[self.tag.pk],
+            image=SimpleUploadedFile('photo.png', image, 'image/png'),
+            **{'ingredients[0]id': self.ingredient.pk,
+               'ingredients[0]amount': 1}), format='multipart')
+        return (request, RecipeViewSet.as_view({'post': 'create'}), {},
+                int(request.META['CONTENT_LENGTH']))
+
+    def _put(self, image):
+        return (self.factory.put(f'/api/recipes/{self.recipe.pk}/image/',
+                                 image, content_type='image/png'),
+                RecipeViewSet.as_view({'put': 'put_image'},
+                                      **RecipeViewSet.put_image.kwargs),
+                {'pk': self.recipe.pk}, len(image))
+
+    def _call(self, request, image, trace=False):
+        """Выполняет запрос, отдаёт время и пик памяти Python."""
+        request, view, kwargs, length = request(image)
+        force_authenticate(request, user=self.user)
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        response = view(request, **kwargs)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        if trace:
+            tracemalloc.stop()
+        if response.status_code not in (200, 201):
+            raise CommandError(f'{request.path}: {response.data}')
+        return elapsed, peak, length
+
+    def _report(self, title, request, image, repeat):
+        """Выводит лучшую скорость и пик памяти."""
+        elapsed = min(self._call(request, image)[0] for _ in range(repeat))
+        _, peak, length = self._call(request, image, trace=True)
+        self.stdout.write(f'{title:>10} {length / 1024 / 1024:>9.1f} '
+                          f'{len(image) / 1024 / 1024 / elapsed:>8.1f} '
+                          f'{peak / 1024 / 1024:>15.1f}')
@@ -0,0 +1,80 @@
+import csv
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.models import Ingredient
+from core.sandbox import sandbox
+from core.search import IngredientIndex
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время поиска ингредиента на каждое нажатие клавиши: '
+            'индекс ингредиентов против icontains в БД')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients', type=int, default=100000,
+                            help='Кол-во ингредиентов')
+        parser.add_argument('--words', type=int, default=100,
+                            help='Кол-во набираемых названий')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-db', action='store_true',
+                            help='Не замерять поиск icontains в БД')
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        rows = self._get_rows(options['ingredients'], generator)
+        keystrokes = [
+            name[:length]
+            for _, name, _ in generator.sample(rows, options['words'])
+            for length in range(1, min(len(name), 12) + 1)
+        ]
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+
+        index = IngredientIndex()
+        start = time.perf_counter()
+        index.build(rows)
+        self.stdout.write(f'Построение индекса: '
+                          f'{(time.perf_counter() - start) * 1000:.0f} мс')
+        self._report('Индекс', keystrokes,
+                     lambda term: index.find(term, limit))
+
+        if options['no_db']:
+            return
+        with sandbox():
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for _, name, unit in rows), batch_size=5000)
+            self._report('БД icontains', keystrokes, lambda term: list(
+                Ingredient.objects.filter(name__icontains=term)))
+
+    def _get_rows(self, count, generator):
+        """Названия из ingredients.csv, дополненные до нужного кол-ва."""
+        with open(f'{settings.BASE_DIR}/core/management/commands/data/'
+                  'ingredients.csv', encoding='UTF-8') as file:
+            base = list(csv.reader(file))
+        words = [word for name, _ in base for word in name.split()]
+        rows = []
+        while len(rows) < count:
+            name, unit = base[len(rows) % len(base)]
+            if len(rows) >= len(base):
+                name = f'{name} {generator.choice(words)} {len(rows)}'
+            rows.append((len(rows) + 1, name, unit))
+        return rows
+
+    def _report(self, title, keystrokes, search):
+        """Выводит перцентили времени поиска."""
+        timings = []
+        for term in keystrokes:
+            start = time.perf_counter()
+            search(term)
+            timings.append((time.perf_counter() - start) * 1000)
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{title}: нажатий {len(timings)}, '
+            f'p50 {statistics.median(timings):.3f} мс, '
+            f'p99 {percentiles[98]:.3f} мс, '
+            f'max {max(timings):.3f} мс')
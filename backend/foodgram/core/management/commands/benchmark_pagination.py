@@ -0,0 +1,92 @@
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from app.models import Recipe
+from core.sandbox import sandbox
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время ответа глубоких страниц списка рецептов '
+            'при постраничном выводе по номеру и по курсору')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000,
+                            help='Кол-во рецептов в тестовых данных')
+        parser.add_argument('--limit', type=int, default=6,
+                            help='Кол-во рецептов на странице')
+        parser.add_argument('--pages', type=int, nargs='+',
+                            default=(1, 10, 100, 1000),
+                            help='Номера замеряемых страниц')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Кол-во повторов каждого замера')
+
+    def handle(self, *args, **options):
+        self.client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        with sandbox():
+            self._seed(options['recipes'])
+            self._benchmark(options['limit'], options['pages'],
+                            options['repeat'])
+
+    def _seed(self, count_recipes):
+        """Создаёт тестовые рецепты. Запросы идут от имени автора:
+           ответы анонимным пользователям кешируются."""
+        author = User.objects.create(
+            username='benchmark', email='benchmark@benchmark.ru',
+            first_name='Имя', last_name='Фамилия')
+        Recipe.objects.bulk_create(
+            (Recipe(author=author, name=f'benchmark_{i}', text='Описание',
+                    image='recipes/img/benchmark.png', cooking_time=10)
+             for i in range(count_recipes)),
+            batch_size=1000,
+        )
+        self.client.force_authenticate(author)
+
+    def _measure(self, url, repeat):
+        """Медиана времени ответа (мс) и кол-во SQL-запросов."""
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                self.client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), len(context)
+
+    def _cursor_urls(self, limit, pages):
+        """Ссылки на нужные страницы, полученные переходом по курсору."""
+        urls = {}
+        url, page = f'/api/recipes/?limit={limit}&cursor=', 1
+        while url and page <= max(pages):
+            if page in pages:
+                urls[page] = url
+            response = self.client.get(url)
+            url = response.json()['next']
+            if url:
+                parts = urlsplit(url)
+                url = f'{parts.path}?{parts.query}'
+            page += 1
+        return urls
+
+    def _benchmark(self, limit, pages, repeat):
+        """Замеряет обе пагинации на каждой странице."""
+        cursor_urls = self._cursor_urls(limit, pages)
+        self.stdout.write(f'{"страница":>10} {"номер, мс":>12} '
+                          f'{"запросов":>9} {"курсор, мс":>12} '
+                          f'{"запросов":>9}')
+        for page in pages:
+            if page not in cursor_urls:
+                continue
+            number_ms, number_queries = self._measure(
+                f'/api/recipes/?limit={limit}&page={page}', repeat)
+            cursor_ms, cursor_queries = self._measure(
+                cursor_urls[page], repeat)
+            self.stdout.write(f'{page:>10} {number_ms:>12.2f} '
+                              f'{number_queries:>9} {cursor_ms:>12.2f} '
+                              f'{cursor_queries:>9}')
@@ -0,0 +1,108 @@
+import multiprocessing
+import resource
+import tempfile
+import time
+
+import fpdf
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.pdf import FONT_PATH, HEADER_TEXT, render_shopping_list
+
+
+class LegacyPDF(fpdf.FPDF):
+    """Прежний рендер: шрифт подключается в шапке и подвале каждой
+       страницы, набор символов шрифта растёт с каждой строкой."""
+
+    def header(self):
+        self.set_draw_color(*settings.COLOR_RECT)
+        self.set_line_width(1)
+        self.rect(10, settings.HEADER_HEIGNT + 1, 190,
+                  297 - settings.FOOTER_HEIGNT - settings.HEADER_HEIGNT - 2,
+                  style='D')
+        self.set_fill_color(*settings.COLOR_HEADER_FOOTER)
+        self.rect(0, 0, 210, settings.HEADER_HEIGNT, 'F')
+        self.add_font(settings.FONT, '', FONT_PATH, uni=True)
+        self.set_font(settings.FONT, '', settings.SIZE_FONT + 6)
+        w = self.get_string_width(HEADER_TEXT) + 6
+        self.set_x((210 - w) / 2)
+        self.cell(w, 9, HEADER_TEXT, ln=settings.LINE, align='C')
+        self.ln(10)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_fill_color(*settings.COLOR_HEADER_FOOTER)
+        self.rect(0, 297 - settings.FOOTER_HEIGNT, 210,
+                  settings.FOOTER_HEIGNT, 'F')
+        self.add_font(settings.FONT, '', FONT_PATH, uni=True)
+        self.set_font(settings.FONT, '', settings.SIZE_FONT)
+        self.cell(settings.CELL_WIDTH, settings.CELL_HEIGNT,
+                  'Стр. ' + str(self.page_no()), 0, 0, 'C')
+
+
+def render_legacy(ingredients):
+    """Прежний рендер списка покупок."""
+    pdf = LegacyPDF()
+    pdf.alias_nb_pages()
+    pdf.add_page()
+    pdf.set_font(settings.FONT, '', settings.SIZE_FONT)
+    pdf.cell(settings.CELL_WIDTH, settings.CELL_HEIGNT,
+             txt='   Необходимые ингредиенты:', ln=settings.LINE)
+    for line_number, ingredient in enumerate(ingredients, 1):
+        pdf.cell(settings.CELL_WIDTH, settings.CELL_HEIGNT,
+                 ln=settings.LINE,
+                 txt=(f'         {line_number}) '
+                      f'{ingredient["ingredient__name"]}'
+                      f'({ingredient["ingredient__measurement_unit"]})'
+                      f'— {ingredient["amount"]}'),)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+RENDERERS = {'прежний': render_legacy, 'новый': render_shopping_list}
+
+
+def measure(renderer, count, repeat, connection):
+    """Рендерит список в отдельном процессе, чтобы пиковый RSS
+       не зависел от предыдущих замеров."""
+    fpdf.set_global('FPDF_CACHE_MODE', 2)
+    fpdf.set_global('FPDF_CACHE_DIR', tempfile.mkdtemp())
+    ingredients = [{'ingredient__name': f'Ингредиент номер {number}',
+                    'ingredient__measurement_unit': 'г',
+                    'amount': number}
+                   for number in range(count)]
+    RENDERERS[renderer](ingredients)
+    timings = []
+    for _ in range(repeat):
+        start = time.process_time()
+        size = len(RENDERERS[renderer](ingredients))
+        timings.append(time.process_time() - start)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    connection.send((min(timings), peak, size))
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время CPU и пиковый RSS рендера PDF '
+            'списка покупок: прежний и новый рендер')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=(10, 500, 5000),
+                            help='Кол-во разных ингредиентов в списке')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(f'{"ингредиентов":>12} {"рендер":>8} '
+                          f'{"CPU, мс":>9} {"пик RSS, МБ":>12} '
+                          f'{"размер, КБ":>11}')
+        for count in options['sizes']:
+            for renderer in RENDERERS:
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=measure, args=(
+                    renderer, count, options['repeat'], sender))
+                process.start()
+                cpu, peak, size = receiver.recv()
+                process.join()
+                self.stdout.write(f'{count:>12} {renderer:>8} '
+                                  f'{cpu * 1000:>9.1f} {peak / 1024:>12.1f} '
+                                  f'{size / 1024:>11.1f}')
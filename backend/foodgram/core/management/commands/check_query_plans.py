@@ -0,0 +1,203 @@
+import json
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                        ShoppingCart, Tag, TagRecipe)
+from core.sandbox import sandbox
+from users.models import Subscribe, User
+
+ALIAS = re.compile(r'"(\w+)" (U\d+)')
+FROM = re.compile(r'FROM "(\w+)"')
+LIMIT = re.compile(r' LIMIT \d+$')
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$')
+SQLITE_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для SQL-запросов основных эндпоинтов '
+            'и находит последовательное чтение больших таблиц')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000,
+                            help='Кол-во рецептов в тестовых данных')
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help='Таблицы больше этого кол-ва строк '
+                                 'не должны читаться целиком')
+
+    def handle(self, *args, **options):
+        explain = getattr(self, f'_explain_{connection.vendor}', None)
+        if explain is None:
+            raise CommandError(f'EXPLAIN для {connection.vendor} '
+                               'не поддерживается')
+        self.failures = []
+        with sandbox():
+            self._seed(options['recipes'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self._check_all(explain, self._get_large_tables(
+                options['min_rows']))
+
+        if self.failures:
+            raise CommandError('\n\n'.join(self.failures))
+        self.stdout.write(self.style.SUCCESS(
+            'Большие таблицы читаются по индексам'))
+
+    def _seed(self, count_recipes):
+        """Создаёт тестовые данные объёмом, при котором
+           планировщик предпочитает индексы."""
+        users = User.objects.bulk_create(
+            User(username=f'plan_{i}', email=f'plan_{i}@plan.ru',
+                 first_name='Имя', last_name='Фамилия')
+            for i in range(500)
+        )
+        self.user = users[0]
+        self.author = users[1]
+        self.tags = Tag.objects.bulk_create(
+            Tag(name=f'plan_{i}', color=f'#plan{i:02}', slug=f'plan_{i}')
+            for i in range(10)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'plan_{i}', measurement_unit='г')
+            for i in range(2000)
+        )
+        recipes = Recipe.objects.bulk_create(
+            (Recipe(author=users[i % len(users)], name=f'plan_{i}',
+                    text='Описание', image='recipes/img/plan.png',
+                    cooking_time=10)
+             for i in range(count_recipes)),
+            batch_size=1000,
+        )
+        TagRecipe.objects.bulk_create(
+            (TagRecipe(recipe=recipe, tag=self.tags[(index + shift)
+                                                    % len(self.tags)])
+             for index, recipe in enumerate(recipes)
+             for shift in range(index % 3 + 1)),
+            batch_size=1000,
+        )
+        IngredientRecipe.objects.bulk_create(
+            (IngredientRecipe(recipe=recipe, amount=1,
+                              ingredient=ingredients[(index * 5 + shift)
+                                                     % len(ingredients)])
+             for index, recipe in enumerate(recipes)
+             for shift in range(5)),
+            batch_size=1000,
+        )
+        Favorite.objects.bulk_create(
+            Favorite(recipe=recipe, user=self.user)
+            for recipe in recipes[::50]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(recipe=recipe, user=self.user)
+            for recipe in recipes[::100]
+        )
+        Subscribe.objects.bulk_create(
+            Subscribe(user=self.user, author=author)
+            for author in users[1:21]
+        )
+        self.recipe = recipes[0]
+
+        self.client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        self.client.credentials(HTTP_AUTHORIZATION=(
+            f'Token {Token.objects.create(user=self.user).key}'))
+        self.anonymous = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+    def _get_large_tables(self, min_rows):
+        """Таблицы, в которых больше min_rows строк."""
+        return {model._meta.db_table: count
+                for model in apps.get_models()
+                if (count := model.objects.count()) > min_rows}
+
+    def _check_all(self, explain, large_tables):
+        """Проверяет планы запросов основных маршрутов api.
+           Списки читаются по курсору: COUNT(*) постраничного
+           вывода по номеру страницы читает таблицу целиком."""
+        recipe = self.recipe.pk
+        routes = (
+            ('recipes', self.anonymous, '/api/recipes/?limit=6&cursor='),
+            ('recipes', self.client, '/api/recipes/?limit=6&cursor='),
+            ('recipes by tags', self.client,
+             '/api/recipes/?limit=6&cursor=&tags=plan_0&tags=plan_1'),
+            ('recipes favorited', self.client,
+             '/api/recipes/?limit=6&cursor=&is_favorited=1'),
+            ('recipes in shopping cart', self.client,
+             '/api/recipes/?limit=6&cursor=&is_in_shopping_cart=1'),
+            ('recipes by author', self.client,
+             f'/api/recipes/?limit=6&cursor=&author={self.author.pk}'),
+            ('feed', self.client, '/api/recipes/feed/?limit=6&cursor='),
+            ('recipe', self.client, f'/api/recipes/{recipe}/'),
+            ('subscriptions', self.client,
+             '/api/users/subscriptions/?limit=6&cursor='),
+            ('download_shopping_cart', self.client,
+             '/api/recipes/download_shopping_cart/?format=json'),
+        )
+        for name, client, url in routes:
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            if response.status_code >= 400:
+                self.failures.append(
+                    f'GET {url}: статус {response.status_code}')
+                continue
+            self._check(name, client, explain, large_tables,
+                        context.captured_queries)
+
+    def _check(self, name, client, explain, large_tables, queries):
+        """Отмечает запросы, читающие большие таблицы целиком."""
+        who = 'anonymous' if client is self.anonymous else 'user'
+        selects = dict.fromkeys(
+            query['sql'] for query in queries
+            if query['sql'].lstrip().upper().startswith('SELECT'))
+        scans = [(sql, table, detail)
+                 for sql in selects
+                 for table, detail in explain(sql)
+                 if table in large_tables]
+        self.stdout.write(f'{len(selects):>4} {len(scans):>4}  '
+                          f'{name} ({who})')
+        if scans:
+            self.failures.append('\n'.join(
+                [f'{name} ({who}): последовательное чтение'] +
+                [f'   {table} ({large_tables[table]} строк): {detail}\n'
+                 f'   {sql}' for sql, table, detail in scans]))
+
+    def _explain_postgresql(self, sql):
+        """Узлы Seq Scan плана PostgreSQL."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes, scans = [plan[0]['Plan']], []
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.get('Plans', ()))
+            if node['Node Type'] == 'Seq Scan':
+                scans.append((node['Relation Name'],
+                              f'Seq Scan, {node["Plan Rows"]} строк'))
+        return scans
+
+    def _explain_sqlite(self, sql):
+        """Шаги SCAN без индекса плана SQLite. Сортировка без индекса
+           ради одной страницы (LIMIT) тоже читает все подходящие строки,
+           она относится к основной таблице запроса."""
+        aliases = {alias: table for table, alias in ALIAS.findall(sql)}
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+        scans = []
+        for detail in details:
+            match = SQLITE_SCAN.match(detail)
+            if match:
+                table = match.group(1)
+                scans.append((aliases.get(table, table), detail))
+            elif detail == SQLITE_SORT and LIMIT.search(sql):
+                scans.append((FROM.search(sql).group(1), detail))
+        return scans
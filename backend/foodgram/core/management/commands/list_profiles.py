@@ -0,0 +1,55 @@
+import pstats
+from io import StringIO
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import get_profile_path, list_profiles
+
+
+class Command(BaseCommand):
+    help = ('Выводит сохранённые профили запросов, а для указанного '
+            'профиля — самые затратные функции и места выделения памяти')
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?',
+                            help='Id профиля из заголовка X-Profile-Id')
+        parser.add_argument('--sort', default='cumulative',
+                            choices=('cumulative', 'tottime', 'ncalls'),
+                            help='Сортировка функций профиля cProfile')
+        parser.add_argument('--limit', type=int, default=25,
+                            help='Кол-во выводимых функций')
+
+    def handle(self, *args, **options):
+        profiles = list_profiles()
+        if options['profile_id'] is None:
+            if not profiles:
+                self.stdout.write('Сохранённых профилей нет')
+            for profile in profiles:
+                self.stdout.write(
+                    f'{profile["id"]}  {profile["created"][:19]}  '
+                    f'{profile["duration_ms"]:>9.2f} мс  '
+                    f'{profile["status"]}  {",".join(profile["kinds"]):<10} '
+                    f'{profile["user"]}  {profile["method"]} '
+                    f'{profile["path"]}')
+            return
+
+        profile = next((profile for profile in profiles
+                        if profile['id'] == options['profile_id']), None)
+        if profile is None:
+            raise CommandError(f'Профиль {options["profile_id"]} не найден')
+        self.stdout.write(f'{profile["method"]} {profile["path"]}: '
+                          f'статус {profile["status"]}, '
+                          f'{profile["duration_ms"]:.2f} мс')
+        if 'cpu' in profile['kinds']:
+            path = get_profile_path(profile['id'], 'cpu')
+            self.stdout.write(f'\nCPU ({path}):')
+            stream = StringIO()
+            stats = pstats.Stats(path, stream=stream)
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(
+                options['limit'])
+            self.stdout.write(stream.getvalue())
+        if 'memory' in profile['kinds']:
+            path = get_profile_path(profile['id'], 'memory')
+            self.stdout.write(f'Память ({path}):')
+            with open(path, encoding='UTF-8') as file:
+                self.stdout.write(file.read(), ending='')
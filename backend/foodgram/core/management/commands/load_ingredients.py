@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from app.models import Ingredient
+from core.search import ingredient_index
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'data',
+                            'ingredients.csv')
+FIELDS = ('name', 'measurement_unit', )
+JSON_CHUNK = 64 * 1024
+JSON_SEPARATOR = re.compile(r'[\s,]*')
+MAX_REPORTED_SKIPS = 20
+
+
+def read_csv(file):
+    """Строки CSV-файла: название, единица измерения."""
+    yield from csv.reader(file)
+
+
+def read_json(file):
+    """Объекты JSON-массива по одному, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK)
+    position = JSON_SEPARATOR.match(buffer).end()
+    if not buffer.startswith('[', position):
+        raise ValueError('ожидается массив объектов')
+    position += 1
+    while True:
+        position = JSON_SEPARATOR.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK)
+            if not chunk:
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield ([item.get(field) for field in FIELDS]
+               if isinstance(item, dict) else [item])
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+class CopyStream:
+    """Файлоподобный поток строк в формате CSV для COPY FROM STDIN."""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def read(self, size=-1):
+        for row in self._rows:
+            self._writer.writerow(row)
+            if 0 <= size <= self._buffer.tell():
+                break
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты из CSV или JSON: PostgreSQL — через '
+            'COPY во временную таблицу, без повторов по названию '
+            'и единице измерения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH,
+                            help='CSV (название,единица) или JSON-массив '
+                                 'объектов с полями name и measurement_unit')
+        parser.add_argument('--format', choices=tuple(READERS),
+                            help='Формат файла, по умолчанию по расширению')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Проверить файл и посчитать новые '
+                                 'ингредиенты без записи в БД')
+        parser.add_argument('--batch-size', type=int, default=100000,
+                            help='Шаг отчёта о прогрессе и размер пачки '
+                                 'вставки для БД без COPY')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        self.batch_size = options['batch_size']
+        self.read = self.skipped = 0
+        start = time.perf_counter()
+        try:
+            with open(path, encoding='UTF-8', newline='') as file:
+                rows = self._clean(READERS[file_format](file))
+                with transaction.atomic():
+                    created = (self._copy(rows)
+                               if connection.vendor == 'postgresql'
+                               else self._bulk_create(rows))
+                    transaction.set_rollback(options['dry_run'])
+        except (OSError, UnicodeDecodeError, ValueError, csv.Error) as error:
+            raise CommandError(f'{path}: {error}')
+        if created and not options['dry_run']:
+            ingredient_index.invalidate()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'Прочитано {self.read}, пропущено {self.skipped}, '
+            f'{"будет добавлено" if options["dry_run"] else "добавлено"} '
+            f'{created}, уже были в БД или повторялись '
+            f'{self.read - self.skipped - created} '
+            f'за {elapsed:.1f} с ({self.read / elapsed:.0f} строк/с)')
+
+    def _clean(self, rows):
+        """Проверяет строки и отчитывается о прогрессе."""
+        max_lengths = [Ingredient._meta.get_field(field).max_length
+                       for field in FIELDS]
+        for number, row in enumerate(rows, 1):
+            self.read = number
+            if number % self.batch_size == 0:
+                self.stdout.write(f'Прочитано строк: {number}')
+            values = [value.strip() if isinstance(value, str) else ''
+                      for value in row]
+            if (len(values) != len(FIELDS) or not all(values)
+                    or any(len(value) > max_length for value, max_length
+                           in zip(values, max_lengths))):
+                self.skipped += 1
+                if self.skipped <= MAX_REPORTED_SKIPS:
+                    self.stderr.write(f'Строка {number} пропущена: {row}')
+                continue
+            yield values
+
+    def _copy(self, rows):
+        """COPY во временную таблицу и вставка новых ингредиентов
+           одним запросом. Отдаёт кол-во добавленных."""
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        columns = ', '.join(FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE ingredient_staging '
+                f'({" text, ".join(FIELDS)} text) ON COMMIT DROP')
+            cursor.copy_expert(
+                f'COPY ingredient_staging ({columns}) '
+                f'FROM STDIN WITH (FORMAT csv)', CopyStream(rows))
+            # Уже существующие строки отсекаются до вставки,
+            # чтобы не расходовать значения последовательности id.
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT {columns} FROM ingredient_staging staging '
+                f'WHERE NOT EXISTS (SELECT 1 FROM {table} ingredient WHERE '
+                f'ingredient.name = staging.name AND '
+                f'ingredient.measurement_unit = staging.measurement_unit) '
+                f'ON CONFLICT ({columns}) DO NOTHING')
+            return cursor.rowcount
+
+    def _bulk_create(self, rows):
+        """Вставка пачками для БД без COPY. Отдаёт кол-во добавленных."""
+        before = Ingredient.objects.count()
+        while batch := list(islice(rows, self.batch_size)):
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in batch),
+                ignore_conflicts=True)
+        return Ingredient.objects.count() - before
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from app.models import Recipe
+from core.images import make_image_sizes
+
+
+class Command(BaseCommand):
+    help = ('Создаёт уменьшенные WebP-копии фото рецептов, '
+            'для которых их ещё нет')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(
+            thumbnails_for=F('image')).values_list('pk', 'image')
+        count = 0
+        for pk, name in recipes.iterator():
+            try:
+                make_image_sizes(pk, name)
+            except OSError as error:
+                self.stderr.write(f'Рецепт {pk}: {error}')
+                continue
+            count += 1
+        self.stdout.write(f'Создано копий фото: {count}')
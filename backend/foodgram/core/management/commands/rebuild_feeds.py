@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.feed import rebuild_feed
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Собирает заново ленты пользователей, читающих ленту '
+            'из таблицы FeedItem')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            following_count__gte=settings.FEED_FANOUT_MIN_FOLLOWING
+        ).values_list('pk', flat=True)
+        for user in users.iterator():
+            rebuild_feed(user)
+        self.stdout.write(f'Пересобрано лент: {users.count()}')
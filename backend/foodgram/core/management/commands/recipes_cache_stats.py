@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import get_stats
+
+
+class Command(BaseCommand):
+    help = 'Выводит счётчики попаданий и промахов кеша рецептов'
+
+    def handle(self, *args, **kwargs):
+        stats = get_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total * 100 if total else 0
+        self.stdout.write(f'Попаданий: {stats["hits"]}\n'
+                          f'Промахов: {stats["misses"]}\n'
+                          f'Доля попаданий: {ratio:.1f}%')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import COUNTERS, reconcile_counter
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики избранного, рецептов и подписчиков '
+            'с фактическими данными и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Кол-во объектов в одной пачке')
+
+    def handle(self, *args, **options):
+        for model, field, relation in COUNTERS:
+            fixed = reconcile_counter(model, field, relation,
+                                      options['batch_size'])
+            self.stdout.write(f'{model.__name__}.{field}: '
+                              f'исправлено {fixed}')
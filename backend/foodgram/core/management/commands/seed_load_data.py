@@ -0,0 +1,206 @@
+import random
+import time
+from collections import defaultdict
+from itertools import accumulate, islice
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                        ShoppingCart, Tag, TagRecipe)
+from core.cache import invalidate_recipes
+from core.registry import tag_registry
+from core.search import ingredient_index
+from users.models import Subscribe, User
+
+
+class Zipf:
+    """Выбор номеров 0..n-1 с вероятностью, пропорциональной
+       1 / (номер + 1) ** s: первые номера — самые популярные."""
+
+    def __init__(self, generator, n, s):
+        self._generator = generator
+        self._population = range(n)
+        self._cum_weights = list(accumulate(1 / rank ** s
+                                            for rank in range(1, n + 1)))
+
+    def sample(self, k):
+        """k номеров с повторами."""
+        return self._generator.choices(self._population,
+                                       cum_weights=self._cum_weights, k=k)
+
+    def sample_distinct(self, k):
+        """До k разных номеров: при сильном перекосе популярные
+           номера выпадают повторно, поэтому добор ограничен."""
+        k = min(k, len(self._population))
+        chosen = set()
+        for _ in range(4):
+            chosen.update(self.sample(k - len(chosen)))
+            if len(chosen) == k:
+                break
+        return sorted(chosen)
+
+
+class Command(BaseCommand):
+    help = ('Генерирует нагрузочные данные: пользователей, рецепты, '
+            'теги, ингредиенты рецептов, избранное, списки покупок '
+            'и подписки с перекосом популярности по закону Ципфа')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--ingredients', type=int, default=2000,
+                            help='Кол-во ингредиентов, если их нет в БД')
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites-per-user', type=int, default=20,
+                            help='Среднее кол-во рецептов в избранном')
+        parser.add_argument('--carts-per-user', type=int, default=5,
+                            help='Среднее кол-во рецептов в списке покупок')
+        parser.add_argument('--follows-per-user', type=int, default=30,
+                            help='Среднее кол-во подписок')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель закона Ципфа для авторов, '
+                                 'рецептов и ингредиентов, 0 — равномерно')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Одинаковый seed даёт одинаковые данные')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='load',
+                            help='Префикс имён пользователей и тегов')
+
+    def handle(self, *args, **options):
+        self.prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{self.prefix}_',
+                               email__endswith='@load.test').exists():
+            raise CommandError(f'Данные с префиксом {self.prefix} уже есть, '
+                               'укажите другой --prefix')
+        self.generator = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        start = time.perf_counter()
+        self.stats = defaultdict(lambda: [0, 0.0])
+
+        users = self._create_users(options['users'])
+        tags = self._create_tags(options['tags'])
+        ingredients = self._get_ingredients(options['ingredients'])
+        recipes = self._create_recipes(
+            options['recipes'], users, tags, ingredients,
+            options['tags_per_recipe'], options['ingredients_per_recipe'])
+        for model, per_user in ((Favorite, options['favorites_per_user']),
+                                (ShoppingCart, options['carts_per_user'])):
+            self._create_user_recipes(model, users, recipes, per_user)
+        self._create_follows(users, options['follows_per_user'])
+        self._report()
+
+        call_command('reconcile_counters', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        tag_registry.invalidate()
+        ingredient_index.invalidate()
+        invalidate_recipes()
+        elapsed = time.perf_counter() - start
+        total = sum(count for count, _ in self.stats.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {total} за {elapsed:.0f} с'))
+
+    def _save(self, model, batch):
+        """Сохраняет пачку объектов и отдаёт их id."""
+        start = time.perf_counter()
+        pks = [obj.pk for obj in model.objects.bulk_create(batch)]
+        self.stats[model][0] += len(pks)
+        self.stats[model][1] += time.perf_counter() - start
+        return pks
+
+    def _bulk_create(self, model, objects):
+        """Сохраняет объекты пачками и отдаёт их id."""
+        pks, objects = [], iter(objects)
+        while batch := list(islice(objects, self.batch_size)):
+            pks.extend(self._save(model, batch))
+        return pks
+
+    def _report(self):
+        """Кол-во строк и скорость вставки по таблицам."""
+        for model, (count, elapsed) in self.stats.items():
+            self.stdout.write(f'{model.__name__}: {count} за {elapsed:.1f} с '
+                              f'({count / max(elapsed, 1e-9):.0f} строк/с)')
+
+    def _spread(self, mean):
+        """Случайное кол-во со средним mean."""
+        return self.generator.randint(0, 2 * mean)
+
+    def _create_users(self, count):
+        """Пользователи без пароля для входа."""
+        return self._bulk_create(User, (
+            User(username=f'{self.prefix}_{i}',
+                 email=f'{self.prefix}_{i}@load.test',
+                 first_name='Имя', last_name='Фамилия', password='!')
+            for i in range(count)))
+
+    def _create_tags(self, count):
+        """Теги со случайными, ещё не занятыми цветами."""
+        colors = set(Tag.objects.values_list('color', flat=True))
+        tags = []
+        for i in range(count):
+            while (color := f'#{self.generator.randrange(16 ** 6):06X}'
+                   ) in colors:
+                pass
+            colors.add(color)
+            tags.append(Tag(name=f'{self.prefix}_{i}',
+                            slug=f'{self.prefix}_{i}', color=color))
+        return self._bulk_create(Tag, tags)
+
+    def _get_ingredients(self, count):
+        """Ингредиенты из БД, при их отсутствии — новые."""
+        pks = list(Ingredient.objects.order_by('pk').values_list(
+            'pk', flat=True))
+        return pks or self._bulk_create(Ingredient, (
+            Ingredient(name=f'{self.prefix}_{i}', measurement_unit='г')
+            for i in range(count)))
+
+    def _create_recipes(self, count, users, tags, ingredients,
+                        tags_per_recipe, ingredients_per_recipe):
+        """Рецепты популярных авторов и их связи, пачка за пачкой."""
+        authors = Zipf(self.generator, len(users), self.skew)
+        by_tag = Zipf(self.generator, len(tags), 0)
+        by_ingredient = Zipf(self.generator, len(ingredients), self.skew)
+        recipes = []
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            pks = self._save(Recipe, [
+                Recipe(author_id=users[author],
+                       name=f'{self.prefix}_{start + i}', text='Описание',
+                       image='recipes/img/load.png',
+                       cooking_time=self.generator.randint(1, 180))
+                for i, author in enumerate(authors.sample(size))])
+            recipes.extend(pks)
+            self._bulk_create(TagRecipe, (
+                TagRecipe(recipe_id=pk, tag_id=tags[tag])
+                for pk in pks
+                for tag in by_tag.sample_distinct(tags_per_recipe)))
+            self._bulk_create(IngredientRecipe, (
+                IngredientRecipe(recipe_id=pk,
+                                 ingredient_id=ingredients[ingredient],
+                                 amount=self.generator.randint(1, 500))
+                for pk in pks
+                for ingredient in by_ingredient.sample_distinct(
+                    ingredients_per_recipe)))
+        return recipes
+
+    def _create_user_recipes(self, model, users, recipes, per_user):
+        """Избранное или списки покупок с перекосом к популярным
+           рецептам."""
+        popular = Zipf(self.generator, len(recipes), self.skew)
+        self._bulk_create(model, (
+            model(user_id=user, recipe_id=recipes[recipe])
+            for user in users
+            for recipe in popular.sample_distinct(self._spread(per_user))))
+
+    def _create_follows(self, users, per_user):
+        """Граф подписок: на популярных авторов подписано больше."""
+        popular = Zipf(self.generator, len(users), self.skew)
+        self._bulk_create(Subscribe, (
+            Subscribe(user_id=user, author_id=users[author])
+            for user in users
+            for author in popular.sample_distinct(self._spread(per_user))
+            if users[author] != user))
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE',
+                     'OPTIONS'))
+
+_local = threading.local()
+
+
+class RequestTimings:
+    """Замеры одного запроса: SQL-запросы и время сериализации."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка выполнения SQL, считает запросы и их время."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+
+@contextmanager
+def serializer_timer():
+    """Добавляет время блока к сериализации текущего запроса.
+       Вложенные блоки не учитываются повторно, SQL-запросы
+       внутри блока относятся ко времени БД."""
+    timings = getattr(_local, 'timings', None)
+    if timings is None or timings.serializing:
+        yield
+        return
+    timings.serializing = True
+    start, db = time.perf_counter(), timings.db
+    try:
+        yield
+    finally:
+        timings.serializer += (time.perf_counter() - start
+                               - (timings.db - db))
+        timings.serializing = False
+
+
+class Histogram:
+    """Гистограмма значений по границам корзин."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """Гистограммы времени ответа, SQL и сериализации по маршрутам.
+       Хранятся в памяти процесса: каждый воркер gunicorn отдаёт
+       свои значения."""
+
+    durations = (
+        ('request_duration_seconds', 'Время ответа', 'total'),
+        ('request_db_duration_seconds', 'Время SQL-запросов', 'db'),
+        ('request_serializer_duration_seconds', 'Время сериализации',
+         'serializer'),
+    )
+    queries = ('request_db_queries', 'Кол-во SQL-запросов')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = defaultdict(self._create)
+
+    def _create(self):
+        """Гистограммы одного маршрута."""
+        histograms = {name: Histogram(settings.METRICS_DURATION_BUCKETS)
+                      for name, _, _ in self.durations}
+        histograms[self.queries[0]] = Histogram(
+            settings.METRICS_QUERIES_BUCKETS)
+        return histograms
+
+    def observe(self, route, method, status, timings, total):
+        """Учитывает замеры запроса."""
+        values = {'total': total, 'db': timings.db,
+                  'serializer': timings.serializer}
+        with self._lock:
+            histograms = self._series[route, method, f'{status // 100}xx']
+            for name, _, key in self.durations:
+                histograms[name].observe(values[key])
+            histograms[self.queries[0]].observe(timings.queries)
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        prefix = settings.METRICS_PREFIX
+        with self._lock:
+            series = sorted(self._series.items())
+            lines = []
+            for name, help_text in ([name[:2] for name in self.durations]
+                                    + [self.queries]):
+                lines.append(f'# HELP {prefix}_{name} {help_text}')
+                lines.append(f'# TYPE {prefix}_{name} histogram')
+                for (route, method, status), histograms in series:
+                    lines.extend(self._render_histogram(
+                        f'{prefix}_{name}', histograms[name],
+                        f'route="{route}",method="{method}",'
+                        f'status="{status}"'))
+        return '\n'.join(lines) + '\n'
+
+    def _render_histogram(self, name, histogram, labels):
+        """Строки _bucket, _sum и _count одной гистограммы."""
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}'
+        yield f'{name}_sum{{{labels}}} {histogram.sum:.6g}'
+        yield f'{name}_count{{{labels}}} {histogram.count}'
+
+
+metrics = Metrics()
+
+
+def get_route(request, method):
+    """Имя маршрута: класс представления DRF и действие
+       или метод, для остальных — имя представления."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class MetricsMiddleware:
+    """Замеряет кол-во и время SQL-запросов, время сериализации
+       и время ответа, отдаёт их в заголовке Server-Timing
+       и копит гистограммы по маршрутам."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = _local.timings = RequestTimings()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings):
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        total = time.perf_counter() - start
+        method = request.method if request.method in METHODS else 'OTHER'
+        metrics.observe(get_route(request, method), method,
+                        response.status_code, timings, total)
+        response['Server-Timing'] = (
+            f'db;dur={timings.db * 1000:.2f};'
+            f'desc="{timings.queries} queries", '
+            f'serializer;dur={timings.serializer * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}')
+        return response
@@ -1,52 +1,87 @@
-from django.conf import settings
-from fpdf import FPDF
+from rest_framework import status
 from rest_framework.mixins import (CreateModelMixin, DestroyModelMixin,
                                    ListModelMixin)
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-
-class PDF(FPDF):
-    """Класс назначает шапку и подвал PDF-файла."""
-
-    width_a4 = 210
-    height_a4 = 297
-
-    def header(self):
-        """Задаёт шапку."""
-        header_text = 'ПРОЕКТ "ПРОДУКТОВЫЙ ПОМОЩНИК"'
-
-        self.set_draw_color(*settings.COLOR_RECT)
-        self.set_line_width(1)
-        self.rect(10, settings.HEADER_HEIGNT + 1, 190,
-                  self.height_a4 - settings.FOOTER_HEIGNT
-                  - settings.HEADER_HEIGNT - 2, style='D')
-
-        self.set_fill_color(*settings.COLOR_HEADER_FOOTER)
-        self.rect(0, 0, self.width_a4, settings.HEADER_HEIGNT, 'F')
-        self.add_font(settings.FONT, '',
-                      f'{settings.BASE_DIR}/core/fonts/Cuprum-Bold.ttf',
-                      uni=True)
-        self.set_font(settings.FONT, '', settings.SIZE_FONT + 6)
-        w = self.get_string_width(header_text) + 6
-        self.set_x((self.width_a4 - w) / 2)
-        self.cell(w, 9, header_text, ln=settings.LINE, align='C')
-        self.ln(10)
-
-    def footer(self):
-        """Задаёт подвал."""
-        self.set_y(-15)
-        self.set_fill_color(*settings.COLOR_HEADER_FOOTER)
-        self.rect(0, self.height_a4 - settings.FOOTER_HEIGNT,
-                  self.width_a4, settings.FOOTER_HEIGNT, 'F')
-        self.add_font(settings.FONT, '',
-                      f'{settings.BASE_DIR}/core/fonts/Cuprum-Bold.ttf',
-                      uni=True)
-        self.set_font(settings.FONT, '', settings.SIZE_FONT)
-        self.cell(settings.CELL_WIDTH, settings.CELL_HEIGNT,
-                  'Стр. ' + str(self.page_no()), 0, 0, 'C')
+from core.cache import (get_detail_key, get_list_key, get_response_data,
+                        set_response_data)
+from core.metrics import serializer_timer
 
 
 class ListDestroyCreateModelViewSet(GenericViewSet, DestroyModelMixin,
                                     ListModelMixin, CreateModelMixin, ):
     """Набор представлений 'create()', 'destroy()' и 'list()' по умолчанию."""
     pass
+
+
+class SerializerTimingMixin:
+    """Действия 'list()', 'retrieve()', 'create()' и 'update()',
+       учитывающие время сериализации ответа в заголовке Server-Timing
+       и метриках запроса."""
+
+    def get_serializer_data(self, serializer):
+        """Данные ответа сериализатора с замером времени."""
+        with serializer_timer():
+            return serializer.data
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(
+                self.get_serializer_data(serializer))
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(self.get_serializer_data(serializer))
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object())
+        return Response(self.get_serializer_data(serializer))
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        data = self.get_serializer_data(serializer)
+        return Response(data, status=status.HTTP_201_CREATED,
+                        headers=self.get_success_headers(data))
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data,
+                                         partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        if getattr(instance, '_prefetched_objects_cache', None):
+            instance._prefetched_objects_cache = {}
+        return Response(self.get_serializer_data(serializer))
+
+
+class AnonymousCacheMixin:
+    """Отдаёт анонимным пользователям список и детали из кеша."""
+
+    def _cached(self, key, handler, request, *args, **kwargs):
+        """Отдаёт ответ из кеша или кеширует ответ обработчика."""
+        data = get_response_data(key)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_response_data(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        return self._cached(get_list_key(request), super().list,
+                            request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = str(kwargs.get(self.lookup_field))
+        if request.user.is_authenticated or not pk.isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        return self._cached(get_detail_key(request, int(pk)),
+                            super().retrieve, request, *args, **kwargs)
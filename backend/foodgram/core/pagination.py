@@ -1,6 +1,34 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class Pagination(PageNumberPagination):
     """Переименовывает поле для ограничения вывода."""
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(CursorPagination):
+    """Постраничный вывод по курсору без COUNT(*) и OFFSET.
+       Порядок берётся из атрибута 'cursor_ordering' представления."""
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id', )
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', self.ordering)
+
+
+class OptionalCursorPagination(Pagination):
+    """Постраничный вывод по номеру страницы, при наличии
+       параметра 'cursor' (в т.ч. пустого) — по курсору."""
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,25 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from core.images import ImageLimitError, read_image
+
+
+class ImageParser(BaseParser):
+    """Принимает тело запроса как файл изображения,
+       записывая его во временный файл по частям."""
+
+    media_type = 'image/*'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return {}
+        request = parser_context['request']
+        try:
+            return {'image': read_image(
+                stream, media_type,
+                int(request.META.get('CONTENT_LENGTH') or 0))}
+        except ImageLimitError:
+            raise ParseError(f'Размер изображения не должен превышать '
+                             f'{settings.IMAGE_MAX_BYTES // (1024 * 1024)} '
+                             f'МБ.')
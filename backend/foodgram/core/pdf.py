@@ -0,0 +1,72 @@
+import os
+
+import fpdf
+from django.conf import settings
+
+FONT_PATH = os.path.join(settings.BASE_DIR, 'core', 'fonts',
+                         'Cuprum-Bold.ttf')
+HEADER_TEXT = 'ПРОЕКТ "ПРОДУКТОВЫЙ ПОМОЩНИК"'
+
+# Метрики шрифта разбираются при первом рендере и кешируются fpdf
+# в FPDF_CACHE_DIR, а не рядом со шрифтом в каталоге кода.
+os.makedirs(settings.FPDF_CACHE_DIR, exist_ok=True)
+fpdf.set_global('FPDF_CACHE_MODE', 2)
+fpdf.set_global('FPDF_CACHE_DIR', settings.FPDF_CACHE_DIR)
+
+
+class PDF(fpdf.FPDF):
+    """Класс назначает шапку и подвал PDF-файла."""
+
+    width_a4 = 210
+    height_a4 = 297
+
+    def header(self):
+        """Задаёт шапку."""
+        self.set_draw_color(*settings.COLOR_RECT)
+        self.set_line_width(1)
+        self.rect(10, settings.HEADER_HEIGNT + 1, 190,
+                  self.height_a4 - settings.FOOTER_HEIGNT
+                  - settings.HEADER_HEIGNT - 2, style='D')
+
+        self.set_fill_color(*settings.COLOR_HEADER_FOOTER)
+        self.rect(0, 0, self.width_a4, settings.HEADER_HEIGNT, 'F')
+        self.set_font(settings.FONT, '', settings.SIZE_FONT + 6)
+        if not hasattr(self, 'header_width'):
+            self.header_width = self.get_string_width(HEADER_TEXT) + 6
+        self.set_x((self.width_a4 - self.header_width) / 2)
+        self.cell(self.header_width, 9, HEADER_TEXT, ln=settings.LINE,
+                  align='C')
+        self.ln(10)
+
+    def footer(self):
+        """Задаёт подвал."""
+        self.set_y(-15)
+        self.set_fill_color(*settings.COLOR_HEADER_FOOTER)
+        self.rect(0, self.height_a4 - settings.FOOTER_HEIGNT,
+                  self.width_a4, settings.FOOTER_HEIGNT, 'F')
+        self.set_font(settings.FONT, '', settings.SIZE_FONT)
+        self.cell(settings.CELL_WIDTH, settings.CELL_HEIGNT,
+                  'Стр. ' + str(self.page_no()), 0, 0, 'C')
+
+
+def render_shopping_list(ingredients):
+    """Отдаёт PDF-файл списка покупок в виде байт-строки."""
+    pdf = PDF()
+    pdf.alias_nb_pages()
+    pdf.add_font(settings.FONT, '', FONT_PATH, uni=True)
+    pdf.set_title('Ingredients')
+    pdf.set_author('Yaremenko V.V.')
+    pdf.add_page()
+    pdf.set_font(settings.FONT, '', settings.SIZE_FONT)
+
+    pdf.cell(settings.CELL_WIDTH, settings.CELL_HEIGNT,
+             txt='   Необходимые ингредиенты:', ln=settings.LINE)
+    for line_number, ingredient in enumerate(ingredients, 1):
+        pdf.cell(settings.CELL_WIDTH, settings.CELL_HEIGNT,
+                 ln=settings.LINE,
+                 txt=(f'         {line_number}) '
+                      f'{ingredient["ingredient__name"]}'
+                      f'({ingredient["ingredient__measurement_unit"]})'
+                      f'— {ingredient["amount"]}'),)
+
+    return pdf.output(dest='S').encode('latin-1')
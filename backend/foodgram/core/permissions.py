@@ -1,3 +1,6 @@
+from hmac import compare_digest
+
+from django.conf import settings
 from rest_framework import permissions
 
 
@@ -18,3 +21,14 @@ class ReadFileIsAuthenticatedPermission(permissions.BasePermission):
        аутентифицированный пользователь."""
     def has_permission(self, request, view):
         return request.user.is_authenticated
+
+
+class MetricsPermission(permissions.BasePermission):
+    """Метрики доступны персоналу или по внутреннему токену
+       в заголовке X-Metrics-Token."""
+    def has_permission(self, request, view):
+        if request.user.is_staff:
+            return True
+        token = request.headers.get('X-Metrics-Token', '')
+        return bool(settings.METRICS_TOKEN) and compare_digest(
+            token.encode(), settings.METRICS_TOKEN.encode())
@@ -0,0 +1,174 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+KINDS = ('cpu', 'memory')
+META_SUFFIX = '.json'
+CPU_SUFFIX = '.prof'
+MEMORY_SUFFIX = '.mem.txt'
+
+_lock = threading.Lock()
+
+
+def get_kinds(request):
+    """Запрошенные виды профилирования из заголовка X-Profile
+       или параметра profile: cpu, memory или оба через запятую."""
+    value = (request.headers.get('X-Profile')
+             or request.GET.get('profile', ''))
+    kinds = {kind.strip() for kind in value.lower().split(',')}
+    if kinds & {'1', 'true'}:
+        kinds.add('cpu')
+    return [kind for kind in KINDS if kind in kinds]
+
+
+def get_user(request):
+    """Пользователь сессии или токена: профилировать может
+       только персонал, проверка нужна до выполнения запроса.
+       Аутентификаторы DRF вызываются напрямую, чтобы request.user
+       не подменялся пользователем токена."""
+    if request.user.is_authenticated:
+        return request.user
+    drf_request = Request(request)
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(drf_request)
+        except APIException:
+            return None
+        if result is not None:
+            return result[0]
+    return None
+
+
+def _write(path, content):
+    with open(path, 'w', encoding='UTF-8') as file:
+        file.write(content)
+
+
+def _rotate(directory, max_profiles):
+    """Удаляет самые старые профили сверх max_profiles."""
+    ids = sorted(name[:-len(META_SUFFIX)] for name in os.listdir(directory)
+                 if name.endswith(META_SUFFIX))
+    for profile_id in ids[:-max_profiles or None]:
+        for suffix in (META_SUFFIX, CPU_SUFFIX, MEMORY_SUFFIX):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def save_profile(request, response, user, profiler, snapshot, peak,
+                 elapsed):
+    """Сохраняет профили запроса и отдаёт их id."""
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    now = timezone.now()
+    profile_id = f'{now:%Y%m%dT%H%M%S%f}_{os.getpid()}'
+    path = os.path.join(directory, profile_id)
+    kinds = []
+    if profiler is not None:
+        profiler.dump_stats(path + CPU_SUFFIX)
+        kinds.append('cpu')
+    if snapshot is not None:
+        statistics = snapshot.statistics('lineno')
+        _write(path + MEMORY_SUFFIX, '\n'.join(
+            [f'peak {peak / 1024:.1f} KiB, '
+             f'allocated {sum(stat.size for stat in statistics) / 1024:.1f}'
+             f' KiB in {sum(stat.count for stat in statistics)} blocks']
+            + [str(stat) for stat in
+               statistics[:settings.PROFILE_TOP_ALLOCATIONS]]) + '\n')
+        kinds.append('memory')
+    _write(path + META_SUFFIX, json.dumps({
+        'id': profile_id,
+        'created': now.isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'user': user.get_username(),
+        'duration_ms': round(elapsed * 1000, 2),
+        'kinds': kinds,
+    }, ensure_ascii=False))
+    _rotate(directory, settings.PROFILE_MAX_PROFILES)
+    return profile_id
+
+
+def list_profiles():
+    """Описания сохранённых профилей, новые первыми."""
+    directory = settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith(META_SUFFIX):
+            with open(os.path.join(directory, name),
+                      encoding='UTF-8') as file:
+                profiles.append(json.load(file))
+    return profiles
+
+
+def get_profile_path(profile_id, kind):
+    """Путь к файлу профиля вида kind."""
+    suffix = CPU_SUFFIX if kind == 'cpu' else MEMORY_SUFFIX
+    return os.path.join(settings.PROFILE_DIR, profile_id + suffix)
+
+
+class ProfilingMiddleware:
+    """По заголовку X-Profile или параметру profile профилирует
+       запрос персонала через cProfile и/или tracemalloc. Включается
+       PROFILING_ENABLED. В процессе одновременно профилируется один
+       запрос: tracemalloc глобален, остальные выполняются как обычно."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        kinds = settings.PROFILING_ENABLED and get_kinds(request)
+        if not kinds:
+            return self.get_response(request)
+        user = get_user(request)
+        if user is None or not user.is_staff:
+            return self.get_response(request)
+        if not _lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile-Id'] = 'busy'
+            return response
+        try:
+            return self._profile(request, user, kinds)
+        finally:
+            _lock.release()
+
+    def _profile(self, request, user, kinds):
+        """Выполняет запрос под профилировщиками и сохраняет профили."""
+        profiler = cProfile.Profile() if 'cpu' in kinds else None
+        tracing = 'memory' in kinds and not tracemalloc.is_tracing()
+        snapshot = None
+        peak = 0
+        with ExitStack() as stack:
+            if tracing:
+                tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+                stack.callback(tracemalloc.stop)
+            start = time.perf_counter()
+            if profiler is not None:
+                profiler.enable()
+                stack.callback(profiler.disable)
+            response = self.get_response(request)
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+            if tracing:
+                snapshot = tracemalloc.take_snapshot().filter_traces((
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                ))
+                peak = tracemalloc.get_traced_memory()[1]
+        response['X-Profile-Id'] = save_profile(
+            request, response, user, profiler, snapshot, peak, elapsed)
+        return response
@@ -0,0 +1,124 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.dispatch import receiver
+
+from app.models import Tag
+from core.cache import bump_version, get_version
+
+_request = threading.local()
+
+
+@receiver(request_started)
+def start_request(**kwargs):
+    """Начинает запрос: версии реестров проверяются заново."""
+    _request.checked = set()
+
+
+@receiver(request_finished)
+def finish_request(**kwargs):
+    _request.checked = None
+
+
+class Registry:
+    """Данные, загруженные в память один раз на процесс.
+       Перечитываются из БД, когда меняется их версия в общем кеше,
+       и не реже чем раз в max_age секунд: с кешем в памяти процесса
+       версия, изменённая в другом процессе, сюда не доходит.
+       В пределах запроса версия читается из кеша один раз."""
+
+    version_key = None
+    max_age = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._expires = 0
+
+    def __deepcopy__(self, memo):
+        """Реестр один на процесс и не копируется."""
+        return self
+
+    def _build(self):
+        """Читает данные из БД."""
+        raise NotImplementedError
+
+    def _load(self):
+        """Перечитывает данные, если их версия изменилась
+           или истёк max_age."""
+        checked = getattr(_request, 'checked', None)
+        if checked is not None and self in checked:
+            return
+        version = get_version(self.version_key)
+        if version != self._version or self._expires < time.monotonic():
+            with self._lock:
+                if (version != self._version
+                        or self._expires < time.monotonic()):
+                    self._build()
+                    self._version = version
+                    self._expires = (float('inf') if self.max_age is None
+                                     else time.monotonic() + self.max_age)
+        if checked is not None:
+            checked.add(self)
+
+    def warm(self):
+        """Загружает данные заранее, до первого запроса."""
+        self._load()
+
+    def invalidate(self):
+        """Помечает данные всех процессов устаревшими."""
+        bump_version(self.version_key)
+        checked = getattr(_request, 'checked', None)
+        if checked is not None:
+            checked.discard(self)
+
+
+class TagRegistry(Registry):
+    """Теги, загруженные в память один раз на процесс."""
+
+    version_key = 'tags:registry:version'
+    max_age = settings.TAG_REGISTRY_MAX_AGE
+
+    def __init__(self):
+        super().__init__()
+        self._tags = ()
+        self._by_pk = {}
+        self._by_slug = {}
+
+    def _build(self):
+        tags = tuple(Tag.objects.order_by('pk'))
+        self._by_pk = {tag.pk: tag for tag in tags}
+        self._by_slug = {tag.slug: tag for tag in tags}
+        self._tags = tags
+
+    def all(self):
+        """Все теги."""
+        self._load()
+        return self._tags
+
+    def get(self, pk):
+        """Тег по id или None."""
+        self._load()
+        try:
+            return self._by_pk.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def get_many(self, pks):
+        """Теги по списку id, неизвестные id пропускаются."""
+        self._load()
+        return [self._by_pk[pk] for pk in pks if pk in self._by_pk]
+
+    def get_by_slug(self, slug):
+        """Тег по slug или None."""
+        self._load()
+        return self._by_slug.get(slug)
+
+    def slug_choices(self):
+        """Варианты slug-ов для фильтра."""
+        return [(tag.slug, tag.name) for tag in self.all()]
+
+
+tag_registry = TagRegistry()
@@ -0,0 +1,31 @@
+import tempfile
+from contextlib import contextmanager
+
+from django.test.utils import (override_settings, setup_databases,
+                               teardown_databases)
+
+from core.images import image_sizes
+
+SANDBOX_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sandbox',
+    }
+}
+
+
+@contextmanager
+def sandbox(**overrides):
+    """Временная тестовая БД, кеш в памяти процесса и каталог медиа
+       для команд проверок и замеров: тестовые данные, версии кеша
+       и файлы не попадают в рабочие БД, кеш и медиа. Тестовая БД
+       создаётся миграциями и удаляется после выхода из блока,
+       когда фоновые уменьшенные копии фото уже записаны."""
+    with override_settings(CACHES=SANDBOX_CACHES,
+                           MEDIA_ROOT=tempfile.mkdtemp(), **overrides):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            yield
+        finally:
+            image_sizes.wait()
+            teardown_databases(old_config, verbosity=0)
@@ -0,0 +1,92 @@
+from array import array
+from bisect import bisect_left
+from itertools import islice
+
+from django.conf import settings
+
+from app.models import Ingredient
+from core.registry import Registry
+
+
+def normalize(text):
+    """Приводит строку к виду для поиска."""
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def get_trigrams(text):
+    """Множество триграмм строки."""
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+class IngredientIndex(Registry):
+    """Поисковый индекс ингредиентов по названию.
+       Названия хранятся отсортированными: совпадения по началу названия
+       ищутся бинарным поиском, по вхождению — по индексу триграмм."""
+
+    version_key = 'ingredients:index:version'
+    max_age = settings.INGREDIENT_INDEX_MAX_AGE
+
+    def __init__(self):
+        super().__init__()
+        self._names = []
+        self._rows = []
+        self._trigrams = {}
+
+    def _build(self):
+        self.build(Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit').iterator(chunk_size=10000))
+
+    def build(self, rows):
+        """Строит индекс по строкам (id, name, measurement_unit)."""
+        rows = sorted((normalize(name), pk, name, measurement_unit)
+                      for pk, name, measurement_unit in rows)
+        trigrams = {}
+        for position, row in enumerate(rows):
+            for trigram in get_trigrams(row[0]):
+                trigrams.setdefault(trigram, array('L')).append(position)
+        self._names = [row[0] for row in rows]
+        self._rows = [row[1:] for row in rows]
+        self._trigrams = trigrams
+
+    def _candidates(self, words):
+        """Позиции названий, которые могут содержать все слова."""
+        longest = max(words, key=len)
+        if len(longest) < 3:
+            return range(len(self._names))
+        postings = [self._trigrams.get(trigram, ())
+                    for trigram in get_trigrams(longest)]
+        return min(postings, key=len)
+
+    def find(self, term, limit):
+        """Ищет по уже построенному индексу: сначала названия,
+           начинающиеся с запроса, затем содержащие все его слова."""
+        term = normalize(term)
+        if not term:
+            return []
+        names = self._names
+
+        found = []
+        for position in range(bisect_left(names, term), len(names)):
+            if len(found) == limit or not names[position].startswith(term):
+                break
+            found.append(position)
+
+        if len(found) < limit:
+            words = term.split()
+            found.extend(islice(
+                (position for position in self._candidates(words)
+                 if not names[position].startswith(term)
+                 and all(word in names[position] for word in words)),
+                limit - len(found)))
+
+        return [Ingredient(id=pk, name=name, measurement_unit=unit)
+                for pk, name, unit in (self._rows[position]
+                                       for position in found)]
+
+    def search(self, term, limit):
+        """Ищет ингредиенты, перечитывая индекс при его изменении."""
+        self._load()
+        return self.find(term, limit)
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import token_cache
+
+AUTH_FIELDS = frozenset(('password', 'is_active', ))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """Сбрасывает кеш аутентификации при выходе и удалении токена."""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, update_fields=None,
+                           **kwargs):
+    """Сбрасывает кеш аутентификации пользователя при смене пароля
+       и деактивации. При удалении токены удаляются каскадно."""
+    if created or update_fields and not AUTH_FIELDS & set(update_fields):
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+            'key', flat=True):
+        token_cache.invalidate(key)
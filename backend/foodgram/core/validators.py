@@ -1,8 +1,11 @@
 from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import ErrorDetail
 from rest_framework.serializers import ValidationError
 
 from users.models import User
 
+UNKNOWN_ID = 'unknown_id'
+
 
 def validate_favorite_shopping_cart(data, request, model, message):
     """Валидирует actions-ы favorite и shopping_cart."""
@@ -42,6 +45,14 @@ def validate_tags_ingredients(data):
     return data
 
 
+def validate_unknown_ids(unknown):
+    """Сообщает разом обо всех неизвестных id. В ответе они
+       возвращаются числами, см. core.exceptions.exception_handler."""
+    if unknown:
+        raise ValidationError({'unknown_ids': [
+            ErrorDetail(str(pk), code=UNKNOWN_ID) for pk in unknown]})
+
+
 def validate_amount(data, min_value, max_value, beginning_message):
     """Валидирует поле amount."""
     if (min_value > data or
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from django.core.management.utils import get_random_secret_key
 
@@ -63,6 +64,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.metrics.MetricsMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -91,10 +94,15 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+DB_ENGINE = os.getenv('DB_ENGINE', default='django.db.backends.postgresql')
+
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
-        'NAME': os.getenv('DB_NAME', default='postgres'),
+        'ENGINE': DB_ENGINE,
+        # Для SQLite DB_NAME — путь к файлу БД, по умолчанию db.sqlite3.
+        'NAME': os.getenv('DB_NAME', default=(
+            os.path.join(BASE_DIR, 'db.sqlite3')
+            if DB_ENGINE.endswith('sqlite3') else 'postgres')),
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='python2022'),
         'HOST': os.getenv('DB_HOST', default='db'),
@@ -103,6 +111,19 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -157,12 +178,14 @@ REST_FRAMEWORK = {
         'core.pagination.Pagination',
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
 
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+
+    'EXCEPTION_HANDLER': 'core.exceptions.exception_handler',
 }
 
 DJOSER = {
@@ -197,3 +220,35 @@ COLOR_RECT = (140, 43, 104, )
 COLOR_HEADER_FOOTER = (159, 43, 104, )
 HEADER_HEIGNT = 25
 FOOTER_HEIGNT = 20
+RECIPES_CACHE_TIMEOUT = 60 * 10
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_INDEX_MAX_AGE = 60 * 5
+TAG_REGISTRY_MAX_AGE = 60
+PDF_CACHE_MAX_BYTES = 32 * 1024 * 1024
+FPDF_CACHE_DIR = os.getenv('FPDF_CACHE_DIR', default=os.path.join(
+    tempfile.gettempdir(), 'foodgram-fpdf'))
+EXPORT_CHUNK_SIZE = 2000
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', default=2))
+PDF_JOB_TIMEOUT = 60 * 10
+IMAGE_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_DECODE_CHUNK = 4 * 64 * 1024
+IMAGE_SIZES = {'thumbnail': 320, 'medium': 960}
+IMAGE_QUALITY = 80
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+FEED_FANOUT_MIN_FOLLOWING = 50
+FEED_BACKFILL_PER_AUTHOR = 20
+FEED_FANOUT_BATCH = 1000
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+METRICS_PREFIX = 'foodgram'
+METRICS_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+                            2.5, 5, 10, )
+METRICS_QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, )
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', default='0') == '1'
+PROFILE_DIR = os.getenv('PROFILE_DIR',
+                        default=os.path.join(BASE_DIR, 'profiles'))
+PROFILE_MAX_PROFILES = 50
+PROFILE_TOP_ALLOCATIONS = 30
+PROFILE_TRACEMALLOC_FRAMES = 1
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TIMEOUT = 5
@@ -5,7 +5,8 @@ from users.models import Subscribe, User
 
 class UserAdmin(admin.ModelAdmin):
     list_display = ('pk', 'username', 'email',
-                    'first_name', 'last_name', )
+                    'first_name', 'last_name', 'recipes_count',
+                    'followers_count', 'following_count', )
     search_fields = ('username', 'first_name', 'last_name',)
     list_filter = ('is_superuser', 'is_staff', 'is_active', )
     empty_value_display = '-пусто-'
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.1 on 2026-10-18 19:35
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_following_count(apps, schema_editor):
+    """Заполняет счётчик подписок по уже существующим данным."""
+    User = apps.get_model('users', 'User')
+    Subscribe = apps.get_model('users', 'Subscribe')
+    User.objects.update(following_count=Coalesce(Subquery(
+        Subscribe.objects.filter(user=OuterRef('pk')).order_by().values(
+            'user').annotate(count=Count('pk')).values('count')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во подписок'),
+        ),
+        migrations.RunPython(fill_following_count, migrations.RunPython.noop),
+    ]